@@ -1,13 +1,40 @@
 import os
 import io
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify,session
+import sys
+import copy
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, jsonify,session,make_response,stream_with_context,g,has_request_context,got_request_exception
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from functools import wraps
 from flask_migrate import Migrate
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 from werkzeug.utils import secure_filename
 import uuid
 import string
 import random
+import threading
+import time
+import queue
+import json
+import sqlite3
+import hashlib
+import gzip
+import shutil
+import tempfile
+import click
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+import base64
+from urllib.parse import quote
+try:
+    import fcntl
+except ImportError:  # Windows: the storage migrator runs without its cross-process lock
+    fcntl = None
+from collections import OrderedDict, deque
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 from botocore.config import Config
@@ -15,39 +42,420 @@ import os
 import ssl
 import requests
 from dotenv import load_dotenv
-from sqlalchemy import text 
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is used without it
+    orjson = None
+from sqlalchemy import text, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import QueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
 
 load_dotenv()
 
+# Structured logging: records from the "medical.*" loggers go onto a queue and a
+# listener thread formats and writes them, so request threads never block on
+# stdout. LOG_LEVEL sets the level (default INFO), LOG_LEVELS overrides it per
+# logger (e.g. "medical.r2=DEBUG,medical.cache=ERROR") and LOG_FORMAT=text
+# switches from JSON lines to plain text.
+LOG_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields become top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class LogQueueHandler(QueueHandler):
+    """Queues records with their message rendered and the current request attached"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks can't cross to the listener thread safely; render them here
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+        return record
+
+_log_listener = None
+_log_listener_pid = None
+
+def configure_logging():
+    """Attach the queue handler and start this process's listener thread.
+
+    The listener thread doesn't survive fork, so gunicorn's post_fork calls
+    this again to give each worker its own queue and listener.
+    """
+    global _log_listener, _log_listener_pid
+
+    if _log_listener_pid == os.getpid():
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if os.getenv('LOG_FORMAT', 'json') == 'text':
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(process)d] %(message)s'))
+    else:
+        stream.setFormatter(JsonLogFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger('medical')
+    root.handlers = [LogQueueHandler(log_queue)]
+    root.propagate = False
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for override in os.getenv('LOG_LEVELS', '').split(','):
+        if '=' in override:
+            name, level = override.split('=', 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _log_listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _log_listener.start()
+    _log_listener_pid = os.getpid()
+
+@atexit.register
+def stop_logging():
+    # Drains the queue; a forked child that never configured has no thread to stop
+    if _log_listener is not None and _log_listener_pid == os.getpid():
+        _log_listener.stop()
+
+configure_logging()
+log = logging.getLogger('medical')
+member_log = logging.getLogger('medical.members')
+upload_log = logging.getLogger('medical.uploads')
+r2_log = logging.getLogger('medical.r2')
+cache_log = logging.getLogger('medical.cache')
+
 app = Flask(__name__)
 
+if orjson is not None:
+    class OrjsonProvider(DefaultJSONProvider):
+        """orjson-backed JSON provider producing the same output as the default one"""
+
+        # datetimes go through DefaultJSONProvider.default (HTTP dates), like stdlib json
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+        def dumps(self, obj, **kwargs):
+            if kwargs:
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+        def loads(self, s, **kwargs):
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            if (self.compact is None and self._app.debug) or self.compact is False:
+                return super().response(*args, **kwargs)
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=self.option),
+                mimetype=self.mimetype
+            )
+
+    app.json = OrjsonProvider(app)
+
 users_db = {}
 
-DATABASE_URL = os.getenv('DATABASE_URL')
-DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///medical.db'
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
+def normalize_database_url(url):
+    """Fix postgres:// vs postgresql:// issue"""
+    if url and url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+        app.logger.info("✅ Fixed postgres:// URL format")
+    return url
+
+def setup_database():
+    """Configure database with Railway-specific handling"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    
+    if not DATABASE_URL:
+        # Try Railway's PostgreSQL environment variables
+        PGHOST = os.environ.get('PGHOST')
+        PGPORT = os.environ.get('PGPORT', '5432')
+        PGUSER = os.environ.get('PGUSER')
+        PGPASSWORD = os.environ.get('PGPASSWORD')
+        PGDATABASE = os.environ.get('PGDATABASE')
+        
+        if all([PGHOST, PGUSER, PGPASSWORD, PGDATABASE]):
+            DATABASE_URL = f"postgresql://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{PGDATABASE}"
+            app.logger.info("✅ Constructed DATABASE_URL from Railway variables")
+        else:
+            # Fallback to SQLite for development
+            DATABASE_URL = 'sqlite:///medical.db'
+            app.logger.warning("⚠️ Using SQLite fallback - PostgreSQL not configured")
+    
+    return normalize_database_url(DATABASE_URL)
+
+# Prometheus metrics, served at /metrics. Under gunicorn each worker writes its
+# samples to files in PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) and the
+# scraping worker sums them, so the numbers cover every worker.
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                            ['endpoint', 'method'])
+REQUESTS = Counter('http_requests', 'Requests by endpoint and response status',
+                   ['endpoint', 'method', 'status'])
+REQUESTS_IN_PROGRESS = Gauge('http_requests_in_progress', 'Requests being handled (worker threads busy)',
+                             multiprocess_mode='livesum')
+REQUEST_EXCEPTIONS = Counter('http_request_exceptions', 'Unhandled exceptions by endpoint', ['endpoint'])
+DB_POOL_WAIT = Histogram('db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled DB connection',
+                         buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 5, 30))
+DB_POOL_TIMEOUTS = Counter('db_pool_checkout_timeouts', 'DB connection checkouts that timed out')
+DB_POOL_IN_USE = Gauge('db_pool_connections_in_use', 'Checked-out pooled DB connections',
+                       multiprocess_mode='livesum')
+CACHE_REQUESTS = Counter('cache_requests', 'Cache lookups by cache and result', ['cache', 'result'])
+R2_LATENCY = Histogram('r2_request_duration_seconds', 'R2 API call latency by operation', ['operation'])
+R2_ERRORS = Counter('r2_errors', 'R2 API calls answered with an error status, by operation', ['operation'])
+UPLOAD_BYTES = Counter('upload_bytes', 'Bytes of uploaded medical files by storage', ['storage'])
+STORAGE_MOVES = Counter('storage_moves', 'Files moved between storage backends by the migrator', ['source', 'destination'])
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_in_progress = True
+    REQUESTS_IN_PROGRESS.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
 
-    pass
+@app.teardown_request
+def finish_request_metrics(exc):
+    # Teardown runs even when the response is streamed, so SSE clients count as busy
+    if g.pop('metrics_in_progress', False):
+        REQUESTS_IN_PROGRESS.dec()
 
+def record_request_exception(sender, exception, **extra):
+    REQUEST_EXCEPTIONS.labels(request.endpoint or 'unmatched').inc()
+
+got_request_exception.connect(record_request_exception, app)
+
+def r2_call_started(context, **kwargs):
+    context['started'] = time.perf_counter()
+
+def r2_call_finished(context, model, http_response, **kwargs):
+    """botocore after-call hook: R2 latency/error metrics and, when profiling, the request's R2 time"""
+    start = context.get('started')
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    R2_LATENCY.labels(model.name).observe(elapsed)
+    if http_response.status_code >= 400:
+        R2_ERRORS.labels(model.name).inc()
+    if has_request_context() and 'profile' in g:
+        g.profile['r2'] += elapsed
+
+class PoolMetrics:
+    """Connection-pool counters: checkouts, time spent waiting for them and timeouts"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+pool_metrics = PoolMetrics()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except SQLAlchemyTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        waited = time.perf_counter() - start
+        pool_metrics.record_wait(waited)
+        DB_POOL_WAIT.observe(waited)
+        DB_POOL_IN_USE.inc()
+        return conn
+
+    def _do_return_conn(self, record):
+        DB_POOL_IN_USE.dec()
+        super()._do_return_conn(record)
+
+def build_engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS from DB_* environment variables.
+
+    DB_POOL_SIZE / DB_MAX_OVERFLOW bound connections per worker process, so
+    workers x (pool_size + max_overflow) must stay under the server's
+    connection limit; pool_size + max_overflow should cover the worker's
+    threads. DB_PGBOUNCER=1 is for PgBouncer in transaction mode: PgBouncer
+    does the pooling, so connections are opened per checkout (NullPool) and
+    never carry session state between transactions.
+    """
+    if not database_url.startswith('postgresql'):
+        if database_url.startswith('sqlite') and ':memory:' not in database_url and database_url != 'sqlite://':
+            return {'poolclass': TimedQueuePool}
+        return {}
+
+    connect_args = {'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '10'))}
+    if os.getenv('DB_PGBOUNCER') == '1':
+        return {'poolclass': NullPool, 'connect_args': connect_args}
+
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '15')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '300')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+        'connect_args': connect_args
+    }
+
+# SQLite tuning applied to every new connection (see set_sqlite_pragmas)
+app.config['SQLITE_TUNING'] = os.getenv('SQLITE_TUNING', '1') == '1'
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+app.config['SQLITE_CACHE_KB'] = int(os.getenv('SQLITE_CACHE_KB', '16384'))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL and friends for SQLite, so readers in other workers aren't locked out by writes"""
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not app.config['SQLITE_TUNING']:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')  # persistent, a no-op after the first connection
+        cursor.execute('PRAGMA synchronous=NORMAL')  # safe with WAL; fsync only at checkpoints
+        cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+        cursor.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_KB']}")
+        cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+        cursor.execute('PRAGMA foreign_keys=ON')
+    finally:
+        cursor.close()
+
+# Engine settings must be in place before SQLAlchemy(app) creates the engine
+DATABASE_URL = setup_database()
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(DATABASE_URL)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Optional read replicas (comma-separated URLs), used by @use_replica routes.
+# After a write the client sticks to the primary for DATABASE_REPLICA_STICKY_SECONDS
+# so it reads its own writes, e.g. add_member -> view_member.
+REPLICA_URLS = [normalize_database_url(url.strip())
+                for url in os.getenv('DATABASE_REPLICA_URL', '').split(',') if url.strip()]
+REPLICA_BINDS = [f'replica_{i}' for i in range(len(REPLICA_URLS))]
+app.config['SQLALCHEMY_BINDS'] = {
+    bind: {'url': url, **build_engine_options(url)} for bind, url in zip(REPLICA_BINDS, REPLICA_URLS)
+}
+app.config['DATABASE_REPLICA_STICKY_SECONDS'] = float(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '5'))
 app.secret_key = os.getenv('SECRET_KEY')
 
 app.config['R2_ACCOUNT_ID'] = os.getenv('R2_ACCOUNT_ID')
 app.config['R2_ACCESS_KEY_ID'] = os.getenv('R2_ACCESS_KEY_ID')  
 app.config['R2_SECRET_ACCESS_KEY'] = os.getenv('R2_SECRET_ACCESS_KEY')
 app.config['R2_BUCKET_NAME'] = os.getenv('R2_BUCKET_NAME')
+# Optional override, e.g. a local S3-compatible server for testing
+app.config['R2_ENDPOINT_URL'] = os.getenv('R2_ENDPOINT_URL')
+# One shared client per worker process; size its pool for the worker's threads
+app.config['R2_MAX_POOL_CONNECTIONS'] = int(os.getenv('R2_MAX_POOL_CONNECTIONS', '20'))
 
 # File upload configuration
+# Per-worker member cache (see MemberCache)
+app.config['MEMBER_CACHE_SIZE'] = int(os.getenv('MEMBER_CACHE_SIZE', '256'))
+app.config['MEMBER_CACHE_TTL'] = float(os.getenv('MEMBER_CACHE_TTL', '10'))
+
+# Shared cache tier: memory:// (per worker), redis://host:6379/0 or sqlite:////path/cache.db
+app.config['CACHE_URL'] = os.getenv('CACHE_URL', 'memory://')
+app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', '300'))
+
+# Dashboard SSE: how often the broadcaster checks the change log for other workers' writes
+app.config['DASHBOARD_POLL_SECONDS'] = float(os.getenv('DASHBOARD_POLL_SECONDS', '2'))
+# Each open stream holds a worker thread: streams end after DASHBOARD_STREAM_SECONDS (the
+# browser reconnects and catches up), and past DASHBOARD_MAX_SUBSCRIBERS per worker clients
+# are told to retry later. Sync workers would block on a stream, so they serve none.
+app.config['DASHBOARD_STREAM_SECONDS'] = float(os.getenv('DASHBOARD_STREAM_SECONDS', '60'))
+app.config['DASHBOARD_MAX_SUBSCRIBERS'] = int(os.getenv(
+    'DASHBOARD_MAX_SUBSCRIBERS', '0' if os.getenv('GUNICORN_WORKER_CLASS') == 'sync' else '2'))
+
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16mb max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Uploads up to this size are spooled in memory, larger ones under UPLOAD_FOLDER/.spool
+app.config['UPLOAD_SPOOL_MAX_MEMORY'] = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', str(500 * 1024)))
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
+# /upload-files: files accepted per request (MAX_CONTENT_LENGTH still caps the total) and
+# how many of them are written to storage at once
+app.config['BULK_UPLOAD_MAX_FILES'] = int(os.getenv('BULK_UPLOAD_MAX_FILES', '20'))
+app.config['BULK_UPLOAD_WORKERS'] = int(os.getenv('BULK_UPLOAD_WORKERS', '4'))
+
+# File storage: local, r2, tiered (new uploads on local disk, moved to R2 after
+# STORAGE_HOT_DAYS) or auto (R2 when configured, else local). The migrator moves
+# existing content to match, and deletes content no file refers to any more, every
+# STORAGE_MIGRATE_INTERVAL seconds (0 = off; `flask migrate-storage` runs it once),
+# in one process per host.
+app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'auto')
+app.config['STORAGE_HOT_DAYS'] = float(os.getenv('STORAGE_HOT_DAYS', '30'))
+app.config['STORAGE_MIGRATE_INTERVAL'] = float(os.getenv(
+    'STORAGE_MIGRATE_INTERVAL', '300'))
+app.config['STORAGE_MIGRATE_BATCH'] = int(os.getenv('STORAGE_MIGRATE_BATCH', '50'))
+app.config['STORAGE_MIGRATE_LOCK'] = os.getenv(
+    'STORAGE_MIGRATE_LOCK', os.path.join(tempfile.gettempdir(), 'medical-storage-migrate.lock'))
+
+# Compression at rest for new PDF/Word content: off, gzip or zstd (needs the zstandard
+# package). Kept only when it saves at least STORAGE_COMPRESSION_MIN_SAVING of the size;
+# STORAGE_COMPRESSION_LEVEL 0 means the codec's default (gzip 6, zstd 3).
+app.config['STORAGE_COMPRESSION'] = os.getenv('STORAGE_COMPRESSION', 'off')
+app.config['STORAGE_COMPRESSION_LEVEL'] = int(os.getenv('STORAGE_COMPRESSION_LEVEL', '0'))
+app.config['STORAGE_COMPRESSION_MIN_SAVING'] = float(os.getenv('STORAGE_COMPRESSION_MIN_SAVING', '0.1'))
+
+# Thumbnails of image uploads and first pages of PDFs, rendered by a small per-worker
+# thread pool after upload (needs Pillow; PDFs also need PyMuPDF)
+app.config['PREVIEWS_ENABLED'] = os.getenv('PREVIEWS_ENABLED', '1') == '1'
+app.config['PREVIEW_SIZE'] = int(os.getenv('PREVIEW_SIZE', '320'))  # longest side in pixels
+app.config['PREVIEW_FORMAT'] = os.getenv('PREVIEW_FORMAT', 'webp')  # webp or jpeg
+app.config['PREVIEW_WORKERS'] = int(os.getenv('PREVIEW_WORKERS', '2'))
+
+# Local downloads: SENDFILE_MODE=x-sendfile (Apache/lighttpd) or x-accel (nginx) makes the
+# proxy stream the file instead of a worker; X_ACCEL_REDIRECT_PREFIX is the nginx
+# internal location that maps to UPLOAD_FOLDER.
+app.config['SENDFILE_MODE'] = os.getenv('SENDFILE_MODE', '')
+app.config['USE_X_SENDFILE'] = app.config['SENDFILE_MODE'] == 'x-sendfile'
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
 
 # Create uploads directory with error handling
 try:
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 except Exception as e:
-    print(f"Could not create uploads folder: {e}")
+    log.warning("Could not create uploads folder, using /tmp/uploads: %s", e)
     app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -65,8 +473,125 @@ def inject_template_vars():
         'datetime': datetime
     }
 
+class RoutingSession(FlaskSQLAlchemySession):
+    """db.session that reads from the replica picked by @use_replica; flushes always go to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('db_replica'):
+            return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def mark_primary_write(db_session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+def use_replica(view):
+    """Route a read-only view's queries to a replica, unless this client wrote recently"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if REPLICA_BINDS and session.get('db_primary_until', 0) < time.time():
+            g.db_replica = random.choice(REPLICA_BINDS)
+        return view(*args, **kwargs)
+    return wrapper
+
+def reading_primary():
+    """False inside a use_replica view that was routed to a replica.
+
+    Replica rows can predate a write that was just made (and cache entries
+    just invalidated), so such reads must not refill the shared cache.
+    """
+    return not (has_request_context() and g.get('db_replica'))
+
+@app.after_request
+def stick_to_primary_after_write(response):
+    if REPLICA_BINDS and g.get('db_wrote'):
+        session['db_primary_until'] = time.time() + app.config['DATABASE_REPLICA_STICKY_SECONDS']
+    return response
+
+# Per-request profiling: wall, SQL and R2 time per request, reported in the
+# X-Query-Count / Server-Timing headers and per endpoint at /profile-stats.
+# Nothing is hooked in unless REQUEST_PROFILING=1 (R2 time comes from r2_call_finished).
+app.config['REQUEST_PROFILING'] = os.getenv('REQUEST_PROFILING', '0') == '1'
+app.config['REQUEST_PROFILING_WINDOW'] = int(os.getenv('REQUEST_PROFILING_WINDOW', '1000'))
+
+PROFILE_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class RouteTimings:
+    """Rolling window of the latest request timings for each endpoint"""
+
+    def __init__(self, window):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, wall, queries, sql, r2):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append((wall, queries, sql, r2))
+
+    def stats(self):
+        with self._lock:
+            snapshot = {endpoint: list(samples) for endpoint, samples in self._samples.items()}
+
+        stats = {}
+        for endpoint, samples in snapshot.items():
+            walls = sorted(sample[0] * 1000 for sample in samples)
+            histogram = [{'le_ms': bound, 'count': sum(1 for wall in walls if wall <= bound)}
+                         for bound in PROFILE_BUCKETS_MS]
+            histogram.append({'le_ms': 'inf', 'count': len(walls)})
+            stats[endpoint] = {
+                'requests': len(samples),
+                'p50_ms': round(walls[int(len(walls) * 0.50)], 3),
+                'p95_ms': round(walls[min(len(walls) - 1, int(len(walls) * 0.95))], 3),
+                'p99_ms': round(walls[min(len(walls) - 1, int(len(walls) * 0.99))], 3),
+                'max_ms': round(walls[-1], 3),
+                'avg_queries': round(sum(sample[1] for sample in samples) / len(samples), 2),
+                'avg_sql_ms': round(sum(sample[2] for sample in samples) / len(samples) * 1000, 3),
+                'avg_r2_ms': round(sum(sample[3] for sample in samples) / len(samples) * 1000, 3),
+                'histogram': histogram
+            }
+        return stats
+
+route_timings = RouteTimings(app.config['REQUEST_PROFILING_WINDOW'])
+
+def start_request_profile():
+    g.profile = {'start': time.perf_counter(), 'queries': 0, 'sql': 0.0, 'r2': 0.0}
+
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    wall = time.perf_counter() - profile['start']
+    response.headers['X-Query-Count'] = str(profile['queries'])
+    response.headers['Server-Timing'] = (
+        f"app;dur={wall * 1000:.1f}, "
+        f"sql;dur={profile['sql'] * 1000:.1f};desc=\"{profile['queries']} queries\", "
+        f"r2;dur={profile['r2'] * 1000:.1f}"
+    )
+    route_timings.record(request.endpoint or 'unmatched', wall, profile['queries'], profile['sql'], profile['r2'])
+    return response
+
+def profile_query_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and 'profile' in g:
+        context._profile_start = time.perf_counter()
+
+def profile_query_end(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profile_start', None)
+    if start is not None and has_request_context() and 'profile' in g:
+        g.profile['queries'] += 1
+        g.profile['sql'] += time.perf_counter() - start
+
+if app.config['REQUEST_PROFILING']:
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    event.listen(Engine, 'before_cursor_execute', profile_query_start)
+    event.listen(Engine, 'after_cursor_execute', profile_query_end)
+
 # Initialize extensions
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 migrate = Migrate(app, db)
 
 
@@ -86,6 +611,7 @@ class Member(db.Model):
     medications = db.relationship('Medication', backref='member', lazy=True, cascade="all,delete-orphan")
     diagnoses = db.relationship("Diagnosis", backref='member', lazy=True, cascade="all,delete-orphan")
     medical_files = db.relationship('MedicalFile', backref='member', lazy=True, cascade='all,delete-orphan')
+    terms = db.relationship('MemberTerm', backref='member', lazy=True, cascade='all,delete-orphan')
 
 
     def __repr__(self):
@@ -113,36 +639,46 @@ class Member(db.Model):
     
     def get_medications_list(self):
         return [med.name for med in self.medications]
+
+    def get_underlying_list(self):
+        return [display for display, _ in parse_terms(self.underlying)]
+
+    def get_allergy_list(self):
+        return [display for display, _ in parse_terms(self.drug_allergy)]
     
 class Doctor(db.Model):
     id=db.Column(db.Integer,primary_key=True)
     name=db.Column(db.String(100),nullable=False)
-    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False)
+    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False,index=True)
 
 
 class Medication(db.Model):
     id=db.Column(db.Integer,primary_key=True)
     name=db.Column(db.String(100),nullable=False)
-    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False)
+    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False,index=True)
 
 
 class Diagnosis(db.Model):
     id=db.Column(db.Integer,primary_key=True)
     name=db.Column(db.String(1000),nullable=False)
-    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False)
+    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False,index=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
 class MedicalFile(db.Model):
     id=db.Column(db.Integer,primary_key=True)
     filename=db.Column(db.String(255),nullable=False) #original filename
-    file_path=db.Column(db.String(500),nullable=False) #local file for now
+    file_path=db.Column(db.String(500),nullable=False) #path within backend
+    backend=db.Column(db.String(10),nullable=False,default='local',server_default='local') #'local' or 'r2'
     file_size=db.Column(db.Integer) #file size in bytes
     file_type=db.Column(db.String(50)) #MIME type
     description=db.Column(db.String(500)) #user description
-    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False)
+    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False,index=True)
+    blob_id=db.Column(db.Integer,db.ForeignKey('file_blob.id'),index=True) #NULL for uploads stored before dedup
     uploaded_at =db.Column(db.DateTime,default=datetime.now)
 
+    blob=db.relationship('FileBlob')
+
     def to_dict(self):
         return {
             'id':self.id,
@@ -152,6 +688,510 @@ class MedicalFile(db.Model):
             'description':self.description,
             'uploaded_at':self.uploaded_at.isoformat()
         }
+
+class FileBlob(db.Model):
+    """Stored file content keyed by its SHA-256; MedicalFile rows share it by reference"""
+    id=db.Column(db.Integer,primary_key=True)
+    sha256=db.Column(db.String(64),nullable=False,unique=True)
+    storage_path=db.Column(db.String(500),nullable=False) #R2 key under blobs/ or local path
+    backend=db.Column(db.String(10),nullable=False,default='local',server_default='local') #'local' or 'r2'
+    size=db.Column(db.BigInteger)
+    content_type=db.Column(db.String(50))
+    refcount=db.Column(db.Integer,nullable=False,default=1) #MedicalFile rows pointing here
+    preview_path=db.Column(db.String(500)) #thumbnail next to the content, same backend
+    preview_type=db.Column(db.String(20)) #its MIME type; 'none' if the content can't be rendered
+    encoding=db.Column(db.String(10)) #'gzip' or 'zstd' if stored compressed, else NULL
+    stored_size=db.Column(db.BigInteger) #bytes at rest; size is the original
+    created_at=db.Column(db.DateTime,default=datetime.now)
+
+class MemberTerm(db.Model):
+    """One parsed token of Member.drug_allergy / Member.underlying, indexed for lookups"""
+    __table_args__ = (db.Index('ix_member_term_kind_key', 'kind', 'term_key'),)
+
+    id=db.Column(db.Integer,primary_key=True)
+    kind=db.Column(db.String(20),nullable=False) #'allergy' or 'underlying'
+    term=db.Column(db.String(200),nullable=False) #as entered
+    term_key=db.Column(db.String(200),nullable=False) #normalized for matching
+    member_id=db.Column(db.Integer,db.ForeignKey('member.id'),nullable=False,index=True)
+
+class MemberChange(db.Model):
+    """Append-only log of writes, read by downstream sync through /api/changes"""
+    seq=db.Column(db.Integer,primary_key=True)
+    member_id=db.Column(db.String(6),nullable=False,index=True) #public Member.member_id
+    entity=db.Column(db.String(20),nullable=False) #member, doctor, medication, diagnosis or file
+    entity_id=db.Column(db.Integer)
+    action=db.Column(db.String(10),nullable=False) #create, update or delete
+    changed_at=db.Column(db.DateTime,default=datetime.now,nullable=False)
+
+    def to_dict(self):
+        return {
+            'seq':self.seq,
+            'member_id':self.member_id,
+            'entity':self.entity,
+            'entity_id':self.entity_id,
+            'action':self.action,
+            'changed_at':self.changed_at.isoformat()
+        }
+
+# Any constant key works; it just has to be the same in every worker
+CHANGE_LOG_LOCK_KEY = 0x6d656d63
+
+def queue_for_commit(name, item):
+    """Add item to a list on the current transaction that the commit hooks below act on"""
+    db_session = db.session()
+    if not db_session.in_transaction():
+        db_session.begin()
+    db_session.info.setdefault(name, []).append(item)
+
+def record_change(member_id, entity, action, entity_id=None):
+    """Queue a change-log row; it is written at the caller's commit (and dropped on rollback)"""
+    queue_for_commit('pending_changes', dict(member_id=member_id, entity=entity, action=action, entity_id=entity_id))
+
+def delete_after_commit(backend, path):
+    """Delete stored content once the caller's transaction commits, and not at all if it rolls back"""
+    queue_for_commit('pending_deletes', (backend, path))
+
+@event.listens_for(RoutingSession, 'before_commit')
+def write_change_log(db_session):
+    """Insert queued change rows as the last statements before COMMIT.
+
+    /api/changes and the dashboard hand out seq as a watermark, so seq must
+    follow commit order: a row that took a lower seq but committed later
+    would be skipped by everyone already past it. Change-log writers are
+    serialized from their insert to their commit, on PostgreSQL with a
+    transaction-scoped advisory lock, on SQLite by the database write lock
+    the insert takes anyway. Deferring the insert to here keeps that window
+    down to the commit itself, after any storage I/O the caller did.
+    """
+    pending = db_session.info.pop('pending_changes', None)
+    if not pending:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        db_session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': CHANGE_LOG_LOCK_KEY})
+    db_session.add_all(MemberChange(**change) for change in pending)
+
+@event.listens_for(RoutingSession, 'after_commit')
+def delete_committed_content(db_session):
+    for backend, path in db_session.info.pop('pending_deletes', ()):
+        try:
+            delete_stored_file(backend, path)
+        except Exception as e:
+            # The rows are gone already; the content is orphaned but harmless
+            log.warning("Could not delete %s content %s: %s", backend, path, e)
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def discard_commit_queues(db_session, transaction):
+    if transaction.parent is None:
+        db_session.info.pop('pending_changes', None)
+        db_session.info.pop('pending_deletes', None)
+
+class MemberCache:
+    """Per-worker LRU of detached Member graphs keyed by member_id.
+
+    Entries carry the member's updated_at as their version. Within
+    MEMBER_CACHE_TTL seconds an entry is trusted as-is; after that it is
+    revalidated with a single updated_at lookup, which catches writes made
+    by other workers. Writes in this worker call invalidate() directly.
+    An entry also remembers the get_member_version ETag it was loaded
+    under, if any, so pages served under an ETag can insist on exactly that
+    version.
+    """
+
+    def __init__(self, maxsize=256, ttl=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, member_id):
+        with self._lock:
+            entry = self._entries.get(member_id)
+            if entry is not None:
+                self._entries.move_to_end(member_id)
+            return entry
+
+    def put(self, member_id, version, member, etag=None):
+        with self._lock:
+            self._entries[member_id] = (member, version, time.monotonic(), etag)
+            self._entries.move_to_end(member_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, member_id):
+        with self._lock:
+            self._entries.pop(member_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
+
+member_cache = MemberCache(app.config['MEMBER_CACHE_SIZE'], app.config['MEMBER_CACHE_TTL'])
+
+def get_member(member_id, etag=None):
+    """Read-through lookup of a member (with doctors, medications, diagnoses and files).
+
+    With etag (from get_member_version, just computed) a cached graph is
+    only used if it was loaded under that same ETag: another worker's write
+    doesn't clear this worker's cache, and a stale page must never go out
+    under the new ETag.
+    """
+    entry = member_cache.get(member_id)
+    if entry is not None and etag is not None and entry[3] != etag:
+        entry = None
+    if entry is not None:
+        cached, version, checked_at, cached_etag = entry
+        if time.monotonic() - checked_at > member_cache.ttl:
+            current = db.session.query(Member.updated_at).filter_by(member_id=member_id).scalar()
+            if current != version:
+                member_cache.invalidate(member_id)
+                entry = None
+            else:
+                member_cache.put(member_id, version, cached, cached_etag)
+        if entry is not None:
+            member_cache.hits += 1
+            CACHE_REQUESTS.labels('member', 'hit').inc()
+            return db.session.merge(cached, load=False)
+
+    member_cache.misses += 1
+    CACHE_REQUESTS.labels('member', 'miss').inc()
+    member = Member.query.options(
+        selectinload(Member.doctors),
+        selectinload(Member.medications),
+        selectinload(Member.diagnoses),
+        selectinload(Member.medical_files).selectinload(MedicalFile.blob)
+    ).filter_by(member_id=member_id).first()
+    if not member:
+        return None
+
+    # Cache a detached copy so later commits in this session can't mutate it;
+    # expunge doesn't cascade to the files' blobs (the preview URLs need their digest)
+    for blob in {medical_file.blob for medical_file in member.medical_files} - {None}:
+        db.session.expunge(blob)
+    db.session.expunge(member)
+    member_cache.put(member_id, member.updated_at, member, etag)
+    return db.session.merge(member, load=False)
+
+def invalidate_member(member_id):
+    """Drop a member from the worker and shared caches after any write touching it"""
+    member_cache.invalidate(member_id)
+    cache.delete(f'member:{member_id}:json', 'home:stats')
+    dashboard_broadcaster.notify()
+
+class CacheBackend:
+    """Interface for the shared cache tier.
+
+    Values must be JSON-serializable; every backend stores the encoded
+    text so callers never share mutable objects with the cache.
+    Subclasses implement _get/_set/_delete/_clear.
+    """
+
+    def __init__(self, default_ttl=300):
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self._get(key)
+        if raw is None:
+            self.misses += 1
+            CACHE_REQUESTS.labels('shared', 'miss').inc()
+            return None
+        self.hits += 1
+        CACHE_REQUESTS.labels('shared', 'hit').inc()
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._set(key, json.dumps(value), ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._delete(keys)
+
+    def clear(self):
+        self._clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'backend': type(self).__name__, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, raw, ttl):
+        raise NotImplementedError
+
+    def _delete(self, keys):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    """Bounded in-process LRU with per-key expiry"""
+
+    def __init__(self, maxsize=1024, default_ttl=300):
+        super().__init__(default_ttl)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            raw, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return raw
+
+    def _set(self, key, raw, ttl):
+        with self._lock:
+            self._entries[key] = (raw, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared by all workers through any Redis-protocol server"""
+
+    def __init__(self, url, default_ttl=300, prefix='medical:'):
+        super().__init__(default_ttl)
+        import redis  # optional dependency, only needed for redis:// URLs
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def _get(self, key):
+        try:
+            return self._client.get(self.prefix + key)
+        except Exception as e:
+            cache_log.warning("Cache get failed: %s", e)
+            return None
+
+    def _set(self, key, raw, ttl):
+        try:
+            self._client.setex(self.prefix + key, max(1, int(ttl)), raw)
+        except Exception as e:
+            cache_log.warning("Cache set failed: %s", e)
+
+    def _delete(self, keys):
+        try:
+            self._client.delete(*[self.prefix + key for key in keys])
+        except Exception as e:
+            cache_log.warning("Cache delete failed: %s", e)
+
+    def _clear(self):
+        try:
+            for key in self._client.scan_iter(match=self.prefix + '*'):
+                self._client.delete(key)
+        except Exception as e:
+            cache_log.warning("Cache clear failed: %s", e)
+
+class SQLiteCacheBackend(CacheBackend):
+    """File-backed shared cache; a local stand-in for Redis in tests and single-host deploys"""
+
+    def __init__(self, path, default_ttl=300):
+        super().__init__(default_ttl)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, key):
+        try:
+            row = self._conn().execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            cache_log.warning("Cache get failed: %s", e)
+            return None
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def _write(self, action, sql, params=()):
+        # e.g. "database is locked" past the busy timeout: log it and carry on uncached, like Redis
+        conn = self._conn()
+        try:
+            if isinstance(params, list):
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            cache_log.warning("Cache %s failed: %s", action, e)
+
+    def _set(self, key, raw, ttl):
+        self._write('set', 'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, raw, time.time() + ttl))
+
+    def _delete(self, keys):
+        self._write('delete', 'DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def _clear(self):
+        self._write('clear', 'DELETE FROM cache')
+
+def create_cache_backend(url, default_ttl=300):
+    """Build the cache backend named by CACHE_URL, falling back to memory"""
+    try:
+        if url.startswith(('redis://', 'rediss://', 'unix://')):
+            return RedisCacheBackend(url, default_ttl)
+        if url.startswith('sqlite:///'):
+            return SQLiteCacheBackend(url[len('sqlite:///'):], default_ttl)
+    except Exception as e:
+        cache_log.warning("Could not start %s cache backend, using memory cache: %s", url.split('://')[0], e)
+    return MemoryCacheBackend(default_ttl=default_ttl)
+
+cache = create_cache_backend(app.config['CACHE_URL'], app.config['CACHE_DEFAULT_TTL'])
+
+def get_member_version(member_id):
+    """(etag, last_modified) for a member from one aggregate query, or None if missing.
+
+    The version covers Member.updated_at plus the count/max id of every
+    child table, so edits that don't touch the member row still change it.
+    """
+    def child_stats(model, *extra):
+        return [
+            db.select(db.func.count(model.id)).where(model.member_id == Member.id).scalar_subquery(),
+            db.select(db.func.max(model.id)).where(model.member_id == Member.id).scalar_subquery(),
+        ] + [db.select(db.func.max(column)).where(model.member_id == Member.id).scalar_subquery()
+             for column in extra]
+
+    row = db.session.execute(
+        db.select(
+            Member.id, Member.updated_at,
+            *child_stats(Doctor),
+            *child_stats(Medication),
+            *child_stats(Diagnosis, Diagnosis.updated_at),
+            *child_stats(MedicalFile, MedicalFile.uploaded_at)
+        ).where(Member.member_id == member_id)
+    ).first()
+    if row is None:
+        return None
+
+    etag = hashlib.sha1('|'.join(str(value) for value in row).encode()).hexdigest()
+    timestamps = [value for value in (row[1], row[8], row[11]) if value is not None]
+    # Columns hold naive local time (datetime.now()); HTTP dates are UTC
+    last_modified = max(timestamps).astimezone(timezone.utc) if timestamps else None
+    return etag, last_modified
+
+def not_modified(etag, last_modified):
+    """True when the request's If-None-Match / If-Modified-Since validators still match"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def with_validators(response, etag, last_modified):
+    """Attach ETag / Last-Modified and force revalidation of private patient data"""
+    response = make_response(response)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Separator for group_concat on SQLite; names are free text and may contain commas
+AGG_SEPARATOR = '\x1f'
+
+MEMBER_RELATIONS = {'doctors': Doctor, 'medications': Medication, 'diagnoses': Diagnosis}
+
+def member_rows_query(*columns, include=tuple(MEMBER_RELATIONS)):
+    """SELECT of member columns plus doctor/medication/diagnosis names aggregated per member.
+
+    Uses json_agg on PostgreSQL and group_concat on SQLite, so a page of
+    members with all their child names comes back in a single round trip.
+    Returns None on other databases (callers fall back to the ORM).
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return None
+
+    def names(model):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import aggregate_order_by
+            agg = db.func.json_agg(aggregate_order_by(model.name, model.id))
+        else:
+            agg = db.func.group_concat(model.name, AGG_SEPARATOR)
+        return db.select(agg).where(model.member_id == Member.id).scalar_subquery()
+
+    columns = columns or (
+        Member.id, Member.member_id, Member.name, Member.date_of_birth, Member.age,
+        Member.gender, Member.drug_allergy, Member.underlying,
+        Member.created_at, Member.updated_at
+    )
+    return db.select(
+        *columns,
+        *[names(MEMBER_RELATIONS[relation]).label(relation) for relation in include]
+    )
+
+def split_agg(value):
+    """Decode an aggregated name list (json_agg list or group_concat string)"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return value.split(AGG_SEPARATOR)
+
+def serialize_member_row(row):
+    """Same shape as Member.to_dict, built from a member_rows_query row"""
+    return {
+        'id': row.id,
+        'member_id': row.member_id,
+        'name': row.name,
+        'date_of_birth': row.date_of_birth.isoformat(),
+        'age': row.age,
+        'gender': row.gender,
+        'drug_allergy': row.drug_allergy,
+        'underlying': row.underlying,
+        'doctors': split_agg(row.doctors),
+        'medications': split_agg(row.medications),
+        'diagnoses': split_agg(row.diagnoses),
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None
+    }
+
+def serialize_member(member_id):
+    """Member.to_dict for one member without loading the ORM graph, or None"""
+    query = member_rows_query()
+    if query is None:
+        member = Member.query.filter_by(member_id=member_id).first()
+        return member.to_dict() if member else None
+    row = db.session.execute(query.where(Member.member_id == member_id)).first()
+    return serialize_member_row(row) if row else None
     
 def setup_r2_config():
     """Setup and validate R2 configuration with better validation"""
@@ -162,66 +1202,82 @@ def setup_r2_config():
         'bucket_name': os.getenv('R2_BUCKET_NAME')
     }
     
-    # Debug: Print what we have (without showing full credentials)
-    print(f"🔍 R2 Config Check:")
-    print(f"  Account ID: {'✓' if r2_config['account_id'] else '✗'} ({r2_config['account_id'][:8]}... if {r2_config['account_id']} else 'Missing')")
-    print(f"  Access Key: {'✓' if r2_config['access_key'] else '✗'} ({'Set' if r2_config['access_key'] else 'Missing'})")
-    print(f"  Secret Key: {'✓' if r2_config['secret_key'] else '✗'} ({'Set' if r2_config['secret_key'] else 'Missing'})")
-    print(f"  Bucket Name: {'✓' if r2_config['bucket_name'] else '✗'} ({r2_config['bucket_name'] or 'Missing'})")
-    
-    # Validate all required variables are present
+    # Validate all required variables are present (never log the credentials themselves)
     missing_vars = [key for key, value in r2_config.items() if not value]
     if missing_vars:
-        print(f"⚠️ Missing R2 environment variables: {missing_vars}")
-        print("Files will be stored locally instead of R2")
+        r2_log.warning("R2 not configured, files will be stored locally", extra={'missing': missing_vars})
         return None
     
-    print("✅ R2 configuration loaded successfully")
+    r2_log.info("R2 configuration loaded", extra={'bucket': r2_config['bucket_name']})
     return r2_config
 
 # Initialize R2 config
 R2_CONFIG = setup_r2_config()
 
+_r2_client = None
+_r2_client_pid = None
+_r2_client_lock = threading.Lock()
+
 def get_r2_client():
-    """Create R2 client with environment variables and proper SSL configuration"""
+    """Return this process's R2 client, creating it on first use.
+
+    boto3 clients are thread-safe once built but creating them is not, and
+    each one carries its own connection pool, so threaded/gevent workers
+    share a single client per process. The pid check rebuilds it after a
+    fork so workers never reuse the parent's sockets.
+    """
+    global _r2_client, _r2_client_pid
+
+    if _r2_client is not None and _r2_client_pid == os.getpid():
+        return _r2_client
 
     account_id = os.getenv("R2_ACCOUNT_ID")
     access_key = os.getenv("R2_ACCESS_KEY_ID")
     secret_key = os.getenv("R2_SECRET_ACCESS_KEY")
 
     if not account_id or not access_key or not secret_key:
-        print("❌ Missing one or more R2 environment variables")
+        r2_log.error("Missing one or more R2 environment variables")
         return None
 
-    try:
-        config = Config(
-            region_name='auto',
-            retries={'max_attempts': 3, 'mode': 'adaptive'},
-            s3={'addressing_style': 'path'}
-        )
+    with _r2_client_lock:
+        if _r2_client is not None and _r2_client_pid == os.getpid():
+            return _r2_client
+
+        try:
+            config = Config(
+                region_name='auto',
+                retries={'max_attempts': 3, 'mode': 'adaptive'},
+                s3={'addressing_style': 'path'},
+                max_pool_connections=app.config['R2_MAX_POOL_CONNECTIONS'],
+                connect_timeout=5,
+                read_timeout=30
+            )
 
-        endpoint_url = f"https://{account_id}.r2.cloudflarestorage.com"
-        print(f"🔗 Connecting to R2 endpoint: {endpoint_url}")
+            endpoint_url = app.config['R2_ENDPOINT_URL'] or f"https://{account_id}.r2.cloudflarestorage.com"
+            r2_log.info("Connecting to R2", extra={'endpoint': endpoint_url})
 
-        client = boto3.client(
-            's3',
-            endpoint_url=endpoint_url,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            config=config
-        )
-        return client
+            client = boto3.session.Session().client(
+                's3',
+                endpoint_url=endpoint_url,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                config=config
+            )
+            client.meta.events.register('before-call.s3', r2_call_started)
+            client.meta.events.register('after-call.s3', r2_call_finished)
+            _r2_client, _r2_client_pid = client, os.getpid()
+            return client
 
-    except Exception as e:
-        print(f"❌ R2 client creation failed: {e}")
-        return None
+        except Exception as e:
+            r2_log.exception("R2 client creation failed")
+            return None
 
 def test_r2_connection():
     """Test R2 connection with better error handling"""
     if not R2_CONFIG:
         return False, "R2 not configured - check environment variables"
     
-    print("🧪 Testing R2 connection...")
+    r2_log.info("Testing R2 connection")
     
     try:
         # Method 1: Try with boto3 client
@@ -229,17 +1285,15 @@ def test_r2_connection():
         if not r2_client:
             return False, "Could not create R2 client"
         
-        print("✓ R2 client created successfully")
-        
         # Test bucket access with minimal request
         response = r2_client.head_bucket(Bucket=R2_CONFIG['bucket_name'])
-        print("✓ Bucket accessible")
+        r2_log.info("R2 bucket accessible", extra={'bucket': R2_CONFIG['bucket_name']})
         
         return True, f"R2 connection successful! Bucket '{R2_CONFIG['bucket_name']}' is accessible"
         
     except ClientError as e:
         error_code = e.response['Error']['Code']
-        print(f"❌ ClientError: {error_code}")
+        r2_log.warning("R2 connection test failed", extra={'error_code': error_code})
         
         if error_code == 'NoSuchBucket':
             return False, f"Bucket '{R2_CONFIG['bucket_name']}' does not exist. Check bucket name in Cloudflare dashboard."
@@ -253,77 +1307,79 @@ def test_r2_connection():
             return False, f"R2 error: {error_code} - {e.response['Error'].get('Message', 'No additional info')}"
             
     except ssl.SSLError as e:
-        print(f"❌ SSL Error: {e}")
+        r2_log.warning("R2 connection test failed with an SSL error: %s", e)
         return False, f"SSL/TLS error: {str(e)}. This might be a network/firewall issue."
         
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        r2_log.exception("R2 connection test failed")
         
         # Try alternative method - direct HTTP request
         try:
-            print("🔄 Trying alternative connection test...")
-            endpoint_url = f"https://{R2_CONFIG['account_id']}.r2.cloudflarestorage.com"
-            response = requests.head(endpoint_url, timeout=10)
-            print(f"✓ HTTP connection to endpoint works (status: {response.status_code})")
+            endpoint_url = app.config['R2_ENDPOINT_URL'] or f"https://{R2_CONFIG['account_id']}.r2.cloudflarestorage.com"
+            response = requests.head(endpoint_url, timeout=3)
+            r2_log.info("R2 endpoint reachable over plain HTTP", extra={'status': response.status_code})
             return False, f"R2 endpoint is reachable but boto3 failed: {str(e)}"
         except Exception as http_e:
             return False, f"Connection completely failed. Original error: {str(e)}. HTTP test: {str(http_e)}"
 
-def upload_to_r2(file, filename, member_id):
-    """Upload file to R2 with better error handling"""
+def upload_to_r2(file, r2_key, content_type=None, content_encoding=None):
+    """Upload file to R2 under r2_key with better error handling"""
     if not R2_CONFIG:
-        print("⚠️ R2 not configured, using local storage")
+        r2_log.debug("R2 not configured, using local storage")
         return None
     
     try:
         r2_client = get_r2_client()
         if not r2_client:
-            print("❌ Could not create R2 client")
+            r2_log.error("Could not create R2 client")
             return None
         
-        # Organize files by member ID
-        r2_key = f"members/{member_id}/{filename}"
-        
-        print(f"📤 Uploading to R2: {r2_key}")
-        
         # Reset file pointer to beginning
         file.seek(0)
         
         # Get content type - handle both file objects and BytesIO objects
-        if hasattr(file, 'content_type') and file.content_type:
+        if content_type:
+            pass
+        elif hasattr(file, 'content_type') and file.content_type:
             content_type = file.content_type
         else:
-            # For BytesIO objects or when content_type is None, determine from filename
+            # For BytesIO objects or when content_type is None, determine from the key
             import mimetypes
-            content_type, _ = mimetypes.guess_type(filename)
+            content_type, _ = mimetypes.guess_type(r2_key)
             if not content_type:
                 content_type = 'application/octet-stream'
         
-        print(f"📄 Content type: {content_type}")
-        
         # Upload with proper content type
-        r2_client.upload_fileobj(
-            file,
-            R2_CONFIG['bucket_name'],
-            r2_key,
-            ExtraArgs={
-                'ContentType': content_type,
-                'Metadata': {
-                    'member_id': str(member_id),
-                    'uploaded_by': 'medical_app'
-                }
+        extra_args = {
+            'ContentType': content_type,
+            'Metadata': {
+                'uploaded_by': 'medical_app'
             }
-        )
+        }
+        if content_encoding:
+            # Presigned downloads come back with it, so clients decompress
+            extra_args['ContentEncoding'] = content_encoding
+        spool = upload_spool(file)
+        if spool and spool.path:
+            spool.flush()
+        source_path = spool.path if spool else (file.name if isinstance(file, io.BufferedReader) else None)
+        if source_path:
+            # upload_fileobj reads a seekable object fully into memory; from a
+            # path boto3 streams the file in chunks
+            r2_client.upload_file(source_path, R2_CONFIG['bucket_name'], r2_key, ExtraArgs=extra_args)
+        else:
+            r2_client.upload_fileobj(file, R2_CONFIG['bucket_name'], r2_key, ExtraArgs=extra_args)
         
-        print(f"✅ File uploaded successfully: {r2_key}")
+        r2_log.info("Uploaded to R2", extra={'key': r2_key, 'content_type': content_type})
         return r2_key
         
     except ClientError as e:
         error_code = e.response['Error']['Code']
-        print(f"❌ R2 upload failed - {error_code}: {e.response['Error'].get('Message', 'No details')}")
+        r2_log.error("R2 upload failed: %s", e.response['Error'].get('Message', 'No details'),
+                     extra={'error_code': error_code, 'key': r2_key})
         return None
     except Exception as e:
-        print(f"❌ Upload error: {e}")
+        r2_log.exception("R2 upload failed", extra={'key': r2_key})
         return None
 
 def download_from_r2(r2_key):
@@ -331,6 +1387,12 @@ def download_from_r2(r2_key):
     if not R2_CONFIG:
         return None
     
+    # Reuse a cached URL while it still has at least 10 minutes to live
+    cache_key = f"r2:url:{r2_key}"
+    url = cache.get(cache_key)
+    if url:
+        return url
+    
     try:
         r2_client = get_r2_client()
         if not r2_client:
@@ -346,43 +1408,812 @@ def download_from_r2(r2_key):
             ExpiresIn=3600  # 1 hour
         )
         
-        print(f"🔗 Generated download URL for: {r2_key}")
+        r2_log.debug("Generated download URL", extra={'key': r2_key})
+        cache.set(cache_key, url, ttl=3000)
         return url
         
     except Exception as e:
-        print(f"❌ Error generating download URL: {e}")
+        r2_log.exception("Could not generate download URL", extra={'key': r2_key})
+        return None
+
+def delete_from_r2(r2_key):
+    """Delete file from R2"""
+    if not R2_CONFIG:
+        return False
+    
+    try:
+        r2_client = get_r2_client()
+        if not r2_client:
+            return False
+        
+        r2_client.delete_object(
+            Bucket=R2_CONFIG['bucket_name'],
+            Key=r2_key
+        )
+        
+        r2_log.info("Deleted from R2", extra={'key': r2_key})
+        cache.delete(f"r2:url:{r2_key}")
+        return True
+        
+    except ClientError as e:
+        r2_log.error("R2 delete failed: %s", e, extra={'key': r2_key})
+        return False
+
+def allowed_file(filename):
+    return '.' in filename and \
+    filename.rsplit('.',1)[1].lower() in ALLOWED_EXTENSIONS
+
+# Leading bytes of the formats in ALLOWED_EXTENSIONS; .docx is a plain zip and is left to the client
+MAGIC_TYPES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+]
+SNIFF_BYTES = 16
+
+def sniff_content_type(head):
+    for magic, content_type in MAGIC_TYPES:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+class UploadSpool:
+    """Spool for one uploaded file that hashes, counts and sniffs the bytes as the form parser writes them.
+
+    Small uploads stay in memory; past UPLOAD_SPOOL_MAX_MEMORY they roll over
+    to a named file under UPLOAD_FOLDER/.spool, so new local content is moved
+    into place with a rename rather than copied. The file is removed on close
+    (Flask closes request files at teardown) unless persist() moved it.
+    """
+
+    def __init__(self, max_memory):
+        self.max_memory = max_memory
+        self.path = None
+        self.size = 0
+        self.head = b''
+        self._sha256 = hashlib.sha256()
+        self._file = io.BytesIO()
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+        if self.path is None and self.size > self.max_memory:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self):
+        spool_dir = os.path.join(app.config['UPLOAD_FOLDER'], '.spool')
+        os.makedirs(spool_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=spool_dir, prefix='upload-')
+        spooled = os.fdopen(fd, 'w+b')
+        spooled.write(self._file.getbuffer())
+        self._file = spooled
+
+    @property
+    def digest(self):
+        return self._sha256.hexdigest()
+
+    @property
+    def sniffed_type(self):
+        return sniff_content_type(self.head)
+
+    def persist(self, dest):
+        """Move the spooled bytes to dest: a rename when they are already on disk"""
+        if self.path:
+            self._file.flush()
+            try:
+                os.replace(self.path, dest)
+                self.path = None
+                return
+            except OSError:
+                pass  # other filesystem; copy below
+        position = self._file.tell()
+        self._file.seek(0)
+        with open(dest, 'wb') as out:
+            shutil.copyfileobj(self._file, out, 1024 * 1024)
+        self._file.seek(position)
+
+    def close(self):
+        self._file.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __getattr__(self, name):
+        # read/readline/seek/tell/... for FileStorage, boto3 and send_file
+        return getattr(self._file, name)
+
+class SpoolingRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSpool(app.config['UPLOAD_SPOOL_MAX_MEMORY'])
+
+app.request_class = SpoolingRequest
+
+def upload_spool(file):
+    if isinstance(file, UploadSpool):
+        return file
+    stream = getattr(file, 'stream', None)
+    return stream if isinstance(stream, UploadSpool) else None
+
+def upload_content_type(file):
+    """The type sniffed from the upload's leading bytes, else what the client sent"""
+    spool = upload_spool(file)
+    return (spool and spool.sniffed_type) or file.content_type
+
+def hash_upload(file, chunk_size=1024 * 1024):
+    """SHA-256 hex digest and size of an upload, read in chunks and rewound.
+
+    Uploads parsed from a request were already hashed while spooling; only
+    other file objects are read here.
+    """
+    spool = upload_spool(file)
+    if spool:
+        return spool.digest, spool.size
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+def blob_key(digest, filename):
+    ext=filename.rsplit('.',1)[1].lower()
+    return f"blobs/{digest[:2]}/{digest}.{ext}"
+
+# Images are already compressed and .docx is a zip, but its XML parts are often stored
+# uncompressed by scanners and converters; compress_upload keeps whatever actually shrinks
+COMPRESSIBLE_TYPES = {
+    'application/pdf',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+ENCODING_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+def compression_writer(out, codec, level=0, size=-1):
+    """Writable file object compressing into out with codec; closing it leaves out open"""
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=out, mode='wb', compresslevel=level or 6, mtime=0)
+    if codec == 'zstd':
+        import zstandard  # optional dependency, only needed for STORAGE_COMPRESSION=zstd
+        return zstandard.ZstdCompressor(level=level or 3).stream_writer(out, size=size, closefd=False)
+    raise ValueError(f"Unknown compression {codec!r}")
+
+def decoding_reader(raw, encoding):
+    """Readable view of stored content with its at-rest compression undone"""
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+    return raw
+
+def compress_upload(file, content_type, size):
+    """Compressed copy of an upload as an UploadSpool, or None to store it as is.
+
+    None when STORAGE_COMPRESSION is off, the type isn't in COMPRESSIBLE_TYPES
+    or the result doesn't save STORAGE_COMPRESSION_MIN_SAVING. The upload is
+    rewound either way.
+    """
+    codec = app.config['STORAGE_COMPRESSION']
+    if codec not in ENCODING_SUFFIXES or content_type not in COMPRESSIBLE_TYPES or not size:
         return None
+    out = UploadSpool(app.config['UPLOAD_SPOOL_MAX_MEMORY'])
+    try:
+        file.seek(0)
+        with compression_writer(out, codec, app.config['STORAGE_COMPRESSION_LEVEL'], size) as writer:
+            shutil.copyfileobj(file, writer, 1024 * 1024)
+    except ImportError as e:
+        out.close()
+        upload_log.warning("STORAGE_COMPRESSION=%s needs the zstandard package: %s", codec, e)
+        return None
+    finally:
+        file.seek(0)
+    if out.size > size * (1 - app.config['STORAGE_COMPRESSION_MIN_SAVING']):
+        out.close()
+        return None
+    out.seek(0)
+    return out
+
+def stored_encoding(medical_file):
+    return medical_file.blob.encoding if medical_file.blob_id else None
+
+def client_accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+class StorageError(Exception):
+    """A storage backend could not write or read file content"""
+
+class StorageBackend:
+    """Interface for where file content lives.
+
+    FileBlob.backend and MedicalFile.backend name the concrete backend
+    ('local' or 'r2') holding the bytes; paths only mean something to that
+    backend. The configured backend (see create_storage_backend) decides
+    where new uploads go through save(), and misplaced() selects the rows
+    StorageMigrator should move to its destination.
+    """
+    name = None
+
+    @property
+    def destination(self):
+        return self
+
+    def available(self):
+        return True
+
+    def save(self, file, key, content_type=None, content_encoding=None):
+        """Store file under key; returns (backend name, path) or raises StorageError.
+
+        content_encoding names the compression the bytes already have, for
+        backends that keep it as object metadata.
+        """
+        raise NotImplementedError
+
+    def open(self, path):
+        """Readable binary file object for the content at path"""
+        raise NotImplementedError
+
+    def delete(self, path):
+        raise NotImplementedError
+
+    def send(self, medical_file):
+        """Download response for the file, or None if it can't be served from here"""
+        raise NotImplementedError
+
+    def misplaced(self, backend_column, created_column):
+        return backend_column != self.destination.name
+
+class LocalStorageBackend(StorageBackend):
+    """Files under UPLOAD_FOLDER on this host's disk"""
+    name = 'local'
+
+    def save(self, file, key, content_type=None, content_encoding=None):
+        local_path = os.path.join(app.config['UPLOAD_FOLDER'], key)
+        try:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            spool = upload_spool(file)
+            if spool:
+                spool.persist(local_path)
+            else:
+                with open(local_path, 'wb') as out:
+                    shutil.copyfileobj(file, out, 1024 * 1024)
+        except OSError as e:
+            raise StorageError(f"Could not write {local_path}: {e}") from e
+        return self.name, local_path
+
+    def open(self, path):
+        try:
+            return open(path, 'rb')
+        except OSError as e:
+            raise StorageError(f"Could not read {path}: {e}") from e
+
+    def delete(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def send(self, medical_file):
+        # Relative to the working directory, like the upload
+        local_path = os.path.abspath(medical_file.file_path)
+        if not os.path.exists(local_path):
+            return None
+        encoding = stored_encoding(medical_file)
+        if encoding and not client_accepts(encoding):
+            return send_decoded_file(medical_file, self.open(local_path), encoding)
+        return send_local_file(medical_file, local_path, encoding)
+
+class R2StorageBackend(StorageBackend):
+    """Objects in the R2 bucket; downloads redirect to presigned URLs"""
+    name = 'r2'
+
+    def available(self):
+        return bool(R2_CONFIG)
+
+    def save(self, file, key, content_type=None, content_encoding=None):
+        if not upload_to_r2(file, key, content_type, content_encoding):
+            raise StorageError(f"R2 upload of {key} failed")
+        return self.name, key
+
+    def open(self, path):
+        r2_client = get_r2_client()
+        if not r2_client:
+            raise StorageError("R2 is not configured")
+        try:
+            return r2_client.get_object(Bucket=R2_CONFIG['bucket_name'], Key=path)['Body']
+        except ClientError as e:
+            raise StorageError(f"Could not read {path} from R2: {e}") from e
+
+    def delete(self, path):
+        delete_from_r2(path)
+
+    def send(self, medical_file):
+        encoding = stored_encoding(medical_file)
+        if encoding and not client_accepts(encoding):
+            return send_decoded_file(medical_file, self.open(medical_file.file_path), encoding)
+        download_url = download_from_r2(medical_file.file_path)
+        return redirect(download_url) if download_url else None
+
+class TieredStorageBackend(StorageBackend):
+    """New uploads go to the hot backend; the migrator moves them to cold after hot_days"""
+    name = 'tiered'
+
+    def __init__(self, hot, cold, hot_days):
+        self.hot = hot
+        self.cold = cold
+        self.hot_days = hot_days
+
+    @property
+    def destination(self):
+        return self.cold
+
+    def save(self, file, key, content_type=None, content_encoding=None):
+        return self.hot.save(file, key, content_type, content_encoding)
+
+    def misplaced(self, backend_column, created_column):
+        return db.and_(backend_column == self.hot.name,
+                       created_column < datetime.now() - timedelta(days=self.hot_days))
+
+local_storage = LocalStorageBackend()
+STORAGE_BACKENDS = {'local': local_storage, 'r2': R2StorageBackend()}
+
+def get_storage_backend(name):
+    """The concrete backend a row's backend column names"""
+    return STORAGE_BACKENDS[name or 'local']
+
+def create_storage_backend(mode, hot_days=30):
+    """Build the storage named by STORAGE_BACKEND, falling back to local disk"""
+    if mode == 'auto':
+        mode = 'r2' if R2_CONFIG else 'local'
+    if mode in ('r2', 'tiered') and not R2_CONFIG:
+        r2_log.warning("STORAGE_BACKEND=%s needs R2, storing files locally", mode)
+        mode = 'local'
+    if mode == 'tiered':
+        return TieredStorageBackend(local_storage, STORAGE_BACKENDS['r2'], hot_days)
+    if mode not in STORAGE_BACKENDS:
+        log.warning("Unknown STORAGE_BACKEND %r, storing files locally", mode)
+        mode = 'local'
+    return STORAGE_BACKENDS[mode]
+
+storage = create_storage_backend(app.config['STORAGE_BACKEND'], app.config['STORAGE_HOT_DAYS'])
+
+def store_blob_content(file, key, content_type=None, content_encoding=None):
+    """Write new content through the configured storage, falling back to local disk; returns (backend, path)"""
+    try:
+        return storage.save(file, key, content_type, content_encoding)
+    except StorageError as e:
+        if storage is local_storage:
+            raise
+        upload_log.warning("Storing upload locally instead: %s", e)
+        file.seek(0)
+        return local_storage.save(file, key, content_type, content_encoding)
+
+def delete_stored_file(backend, path):
+    get_storage_backend(backend).delete(path)
+
+def store_new_content(file, filename, digest, size, content_type):
+    """Compress (when configured) and store content that isn't on record yet.
+
+    Returns the storage columns for its FileBlob. Doesn't touch the database
+    session, so bulk uploads run it on pool threads.
+    """
+    compressed = compress_upload(file, content_type, size)
+    if compressed is None:
+        backend, storage_path = store_blob_content(file, blob_key(digest, filename), content_type)
+        return {'backend': backend, 'storage_path': storage_path, 'encoding': None, 'stored_size': size}
+    encoding = app.config['STORAGE_COMPRESSION']
+    try:
+        backend, storage_path = store_blob_content(
+            compressed, blob_key(digest, filename) + ENCODING_SUFFIXES[encoding], content_type, encoding)
+    finally:
+        compressed.close()
+    return {'backend': backend, 'storage_path': storage_path, 'encoding': encoding, 'stored_size': compressed.size}
+
+def record_blob(digest, size, content_type, location, refs=1):
+    """Add the FileBlob row for content store_new_content just wrote, holding refs references.
+
+    One INSERT ... ON CONFLICT (sha256) DO UPDATE, so if a concurrent upload
+    of the same content recorded it first this takes refs references to that
+    row instead. No SAVEPOINT: pysqlite doesn't emit BEGIN before one, so its
+    RELEASE would commit the caller's transaction along with the row.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"FileBlob upserts need PostgreSQL or SQLite, not {dialect}")
+    statement = insert(FileBlob).values(
+        sha256=digest, size=size, content_type=content_type, refcount=refs, created_at=datetime.now(), **location)
+    statement = statement.on_conflict_do_update(
+        index_elements=[FileBlob.sha256], set_={'refcount': FileBlob.refcount + refs}
+    ).returning(FileBlob.id)
+    blob_id = db.session.execute(statement).scalar_one()
+    blob = db.session.get(FileBlob, blob_id, populate_existing=True)
+    if (blob.backend, blob.storage_path) != (location['backend'], location['storage_path']):
+        # The concurrent upload's copy is the one on record
+        delete_stored_file(location['backend'], location['storage_path'])
+    return blob
+
+def acquire_blob(file, filename, content_type=None):
+    """Return (blob, stored) for an upload, taking one reference in the caller's transaction.
+
+    Content already on record only gets its refcount bumped, so a repeat
+    upload skips the R2 PUT / local write; stored is False in that case.
+    """
+    digest, size = hash_upload(file)
+    blob = FileBlob.query.filter_by(sha256=digest).with_for_update().first()
+    if blob:
+        blob.refcount = FileBlob.refcount + 1
+        return blob, False
+
+    content_type = content_type or file.content_type
+    location = store_new_content(file, filename, digest, size, content_type)
+    return record_blob(digest, size, content_type, location), True
+
+def acquire_blobs(uploads, max_workers=4, locations=None):
+    """acquire_blob for a batch of (file, filename, content_type) uploads.
+
+    Returns (blob, stored) or the exception that stopped it for each upload,
+    in order. Lookups and rows stay on this thread, since the session isn't
+    thread-safe; only store_new_content (the R2 PUTs / local writes) runs
+    concurrently, in a pool of at most max_workers threads. Identical files
+    in one batch are stored once. Every (backend, path) written is appended
+    to locations as soon as it is stored, so a caller whose transaction
+    rolls back, even partway through this call, can delete the content.
+    """
+    hashed = [hash_upload(file) for file, _, _ in uploads]
+    existing = {blob.sha256: blob for blob in FileBlob.query.filter(
+        FileBlob.sha256.in_({digest for digest, _ in hashed})).order_by(FileBlob.id).with_for_update()}
+    refs = {}
+    for digest, _ in hashed:
+        refs[digest] = refs.get(digest, 0) + 1
+    for digest, blob in existing.items():
+        blob.refcount = FileBlob.refcount + refs[digest]
+
+    # The first upload of each new digest stores it
+    first = {}
+    for i, (digest, _) in enumerate(hashed):
+        if digest not in existing:
+            first.setdefault(digest, i)
+    stores = {}
+    if first:
+        with ThreadPoolExecutor(min(max_workers, len(first)), thread_name_prefix='upload') as pool:
+            for digest, i in first.items():
+                file, filename, content_type = uploads[i]
+                stores[digest] = pool.submit(store_new_content, file, filename, digest, hashed[i][1], content_type)
+    if locations is not None:
+        locations.extend((location['backend'], location['storage_path'])
+                         for location in (future.result() for future in stores.values() if not future.exception()))
+
+    results = []
+    for i, ((file, filename, content_type), (digest, size)) in enumerate(zip(uploads, hashed)):
+        if digest in stores and digest not in existing:
+            try:
+                location = stores[digest].result()
+            except Exception as e:
+                results.append(e)
+                continue
+            existing[digest] = record_blob(digest, size, content_type, location, refs[digest])
+        results.append((existing[digest], first.get(digest) == i))
+    return results
+
+def delete_medical_file(medical_file):
+    """Delete a file row in the caller's transaction and release its reference to the content.
+
+    Nothing is deleted from storage before the caller commits. The refcount
+    goes down with a single UPDATE ... SET refcount = refcount - 1, which
+    can't lose a concurrent decrement even where FOR UPDATE is a no-op
+    (SQLite). A blob left at zero stays on record, and an upload of the same
+    content takes it back, until StorageMigrator.collect_unreferenced deletes
+    it. Pre-dedup files without a blob are deleted once the caller commits.
+    """
+    db.session.delete(medical_file)
+    if medical_file.blob_id is None:
+        delete_after_commit(medical_file.backend, medical_file.file_path)
+        return
+    FileBlob.query.filter_by(id=medical_file.blob_id).update({'refcount': FileBlob.refcount - 1})
+
+class StorageMigrator:
+    """Moves stored content to where the configured storage wants it.
+
+    Each pass copies a batch of misplaced blobs (then pre-dedup files that
+    have no blob) to storage.destination, repoints the rows with an UPDATE
+    that only matches while they still have the old location, commits and
+    then deletes the old copy. If a row changed meanwhile (deleted, or moved
+    by another host) the new copy is removed instead. Each pass first
+    deletes content that no file refers to any more. The background thread
+    only works in the process holding an flock on STORAGE_MIGRATE_LOCK, so
+    one worker per host migrates and another takes over if it exits.
+    """
+
+    def __init__(self, interval=0, batch_size=50, lock_path=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lock_path = lock_path
+        self._thread = None
+        self._lock_file = None
+        self._failed = {'blob': set(), 'file': set()}
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='storage-migrator', daemon=True)
+        self._thread.start()
+
+    def _holds_lock(self):
+        if fcntl is None or not self.lock_path:
+            return True
+        try:
+            if self._lock_file is None:
+                self._lock_file = open(self.lock_path, 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._holds_lock():
+                continue
+            try:
+                with app.app_context():
+                    self.collect_unreferenced()
+                    self.run_once()
+                    db.session.remove()
+            except Exception:
+                log.exception("Storage migration pass failed")
+
+    def collect_unreferenced(self):
+        """Delete up to batch_size blobs whose refcount reached zero; returns how many went.
+
+        The row is deleted first, which holds its lock (SQLite: the database
+        write lock) while the content goes and until commit. An upload of the
+        same content either revived the blob before that, so the DELETE
+        matches nothing, or finds it gone afterwards and stores it afresh.
+        """
+        blobs = db.session.query(FileBlob.id, FileBlob.backend, FileBlob.storage_path, FileBlob.preview_path).filter(
+            FileBlob.refcount <= 0).order_by(FileBlob.id).limit(self.batch_size).all()
+        collected = 0
+        for blob_id, backend, storage_path, preview_path in blobs:
+            try:
+                if not FileBlob.query.filter_by(id=blob_id, backend=backend, storage_path=storage_path,
+                                                preview_path=preview_path).filter(
+                        FileBlob.refcount <= 0).delete(synchronize_session=False):
+                    db.session.rollback()
+                    continue
+                delete_stored_file(backend, storage_path)
+                if preview_path:
+                    delete_stored_file(backend, preview_path)
+                db.session.commit()
+                collected += 1
+            except Exception as e:
+                db.session.rollback()
+                log.warning("Could not delete unreferenced blob %s: %s", blob_id, e)
+        return collected
+
+    def run_once(self):
+        """Move up to batch_size misplaced files; returns how many moved"""
+        destination = storage.destination
+        sources = [name for name, backend in STORAGE_BACKENDS.items()
+                   if name != destination.name and backend.available()]
+        if not sources or not destination.available():
+            return 0
+
+        blobs = FileBlob.query.filter(
+            FileBlob.refcount > 0,
+            FileBlob.backend.in_(sources),
+            storage.misplaced(FileBlob.backend, FileBlob.created_at),
+            FileBlob.id.notin_(self._failed['blob'])
+        ).order_by(FileBlob.id).limit(self.batch_size).all()
+        files = MedicalFile.query.filter(
+            MedicalFile.blob_id.is_(None),
+            MedicalFile.backend.in_(sources),
+            storage.misplaced(MedicalFile.backend, MedicalFile.uploaded_at),
+            MedicalFile.id.notin_(self._failed['file'])
+        ).order_by(MedicalFile.id).limit(self.batch_size - len(blobs)).all() if len(blobs) < self.batch_size else []
+
+        moved = 0
+        for kind, row, move in [('blob', blob, self._move_blob) for blob in blobs] + \
+                               [('file', medical_file, self._move_file) for medical_file in files]:
+            try:
+                moved += move(row)
+            except Exception as e:
+                db.session.rollback()
+                self._failed[kind].add(row.id)
+                log.warning("Could not move %s %s: %s", kind, row.id, e)
+        return moved
+
+    def _move_blob(self, blob):
+        old = (blob.backend, blob.storage_path)
+        # Same name on the new backend, including any .gz/.zst suffix
+        key = f"blobs/{blob.sha256[:2]}/{os.path.basename(blob.storage_path)}"
+        new = self._copy(old, key, blob.content_type, blob.encoding)
+        changes = {'backend': new[0], 'storage_path': new[1]}
+        extra = []
+        if blob.preview_path:
+            old_preview = (blob.backend, blob.preview_path)
+            new_preview = self._copy(old_preview, preview_key(blob.sha256, blob.preview_type), blob.preview_type)
+            changes['preview_path'] = new_preview[1]
+            extra.append((old_preview, new_preview))
+        # A preview written meanwhile would be left behind on the old backend
+        moved = FileBlob.query.filter_by(id=blob.id, backend=old[0], storage_path=old[1],
+                                         preview_path=blob.preview_path).update(changes, synchronize_session=False)
+        if moved:
+            MedicalFile.query.filter_by(blob_id=blob.id).update(
+                {'backend': new[0], 'file_path': new[1]}, synchronize_session=False)
+        return self._finish(moved, old, new, extra)
+
+    def _move_file(self, medical_file):
+        old = (medical_file.backend, medical_file.file_path)
+        key = f"members/{medical_file.member.member_id}/{os.path.basename(medical_file.file_path)}"
+        new = self._copy(old, key, medical_file.file_type)
+        moved = MedicalFile.query.filter_by(id=medical_file.id, backend=old[0], file_path=old[1]).update(
+            {'backend': new[0], 'file_path': new[1]}, synchronize_session=False)
+        return self._finish(moved, old, new)
+
+    def _copy(self, old, key, content_type, content_encoding=None):
+        with closing(get_storage_backend(old[0]).open(old[1])) as source:
+            return storage.destination.save(source, key, content_type, content_encoding)
+
+    def _finish(self, moved, old, new, extra=()):
+        if not moved:
+            db.session.rollback()
+            delete_stored_file(*new)
+            for _, extra_new in extra:
+                delete_stored_file(*extra_new)
+            return 0
+        db.session.commit()
+        delete_stored_file(*old)
+        for extra_old, _ in extra:
+            delete_stored_file(*extra_old)
+        STORAGE_MOVES.labels(old[0], new[0]).inc()
+        log.info("Moved file content", extra={'source': old[0], 'destination': new[0], 'path': new[1]})
+        return 1
+
+storage_migrator = StorageMigrator(app.config['STORAGE_MIGRATE_INTERVAL'], app.config['STORAGE_MIGRATE_BATCH'],
+                                   app.config['STORAGE_MIGRATE_LOCK'])
+
+@app.cli.command('migrate-storage')
+def migrate_storage_command():
+    """Delete unreferenced content and move all misplaced content to the configured storage now"""
+    collected = 0
+    while True:
+        swept = storage_migrator.collect_unreferenced()
+        collected += swept
+        if not swept:
+            break
+    click.echo(f"Deleted {collected} unreferenced files")
+    total = 0
+    while True:
+        moved = storage_migrator.run_once()
+        total += moved
+        if not moved:
+            break
+    click.echo(f"Moved {total} files to {storage.destination.name}")
+
+PREVIEW_SOURCE_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'application/pdf'}
+
+@app.template_global()
+def has_preview(medical_file):
+    """Whether the file list should ask /file-preview for a thumbnail of this file"""
+    return (app.config['PREVIEWS_ENABLED'] and medical_file.blob_id is not None
+            and medical_file.file_type in PREVIEW_SOURCE_TYPES)
+
+def preview_key(digest, preview_type):
+    return f"blobs/{digest[:2]}/{digest}.preview.{preview_type.split('/')[-1]}"
+
+def render_preview(data, content_type, size, image_format='webp'):
+    """Encode a thumbnail of an image or of a PDF's first page; returns (bytes, MIME type)"""
+    from PIL import Image, ImageOps  # optional dependency, only needed for previews
 
-def delete_from_r2(r2_key):
-    """Delete file from R2"""
-    if not R2_CONFIG:
-        return False
-    
-    try:
-        r2_client = get_r2_client()
-        if not r2_client:
-            return False
-        
-        r2_client.delete_object(
-            Bucket=R2_CONFIG['bucket_name'],
-            Key=r2_key
-        )
-        
-        print(f"🗑️ File deleted from R2: {r2_key}")
-        return True
-        
-    except ClientError as e:
-        print(f"❌ R2 delete failed: {e}")
-        return False
+    if content_type == 'application/pdf':
+        try:
+            import pymupdf  # optional
+        except ImportError:
+            import fitz as pymupdf  # PyMuPDF < 1.24
+        with pymupdf.open(stream=data, filetype='pdf') as pdf:
+            page = pdf[0]
+            zoom = size / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    else:
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', (size, size))  # JPEG: decode at a reduced scale
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        image = image.convert('RGB')
 
-def allowed_file(filename):
-    return '.' in filename and \
-    filename.rsplit('.',1)[1].lower() in ALLOWED_EXTENSIONS
+    out = io.BytesIO()
+    if image_format == 'webp':
+        image.save(out, 'WEBP', quality=75, method=4)
+        return out.getvalue(), 'image/webp'
+    image.save(out, 'JPEG', quality=80, optimize=True, progressive=True)
+    return out.getvalue(), 'image/jpeg'
 
-def generate_unique_filename(filename):
-    ext=filename.rsplit('.',1)[1].lower()
-    unique_id=str(uuid.uuid4())
-    return f"{unique_id}.{ext}"
+class PreviewGenerator:
+    """Per-worker background rendering of blob previews.
+
+    submit() is called after an upload commits (and by /file-preview when a
+    preview is missing); the thread pool is created on first use so forked
+    workers each get their own. The preview is written next to the content
+    on the same backend and recorded only if the blob hasn't moved meanwhile.
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, blob_id):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='preview')
+                self._pid = os.getpid()
+                self._pending = set()
+            if blob_id in self._pending:
+                return
+            self._pending.add(blob_id)
+        self._executor.submit(self._run, blob_id)
+
+    def _run(self, blob_id):
+        try:
+            with app.app_context():
+                self.generate(blob_id)
+                db.session.remove()
+        except Exception:
+            log.exception("Preview generation failed", extra={'blob_id': blob_id})
+        finally:
+            with self._lock:
+                self._pending.discard(blob_id)
+
+    def generate(self, blob_id):
+        blob = db.session.get(FileBlob, blob_id)
+        if blob is None or blob.preview_type or blob.content_type not in PREVIEW_SOURCE_TYPES:
+            return
+        backend = get_storage_backend(blob.backend)
+        with closing(backend.open(blob.storage_path)) as source:
+            data = decoding_reader(source, blob.encoding).read()
+
+        try:
+            start = time.perf_counter()
+            image, preview_type = render_preview(data, blob.content_type, app.config['PREVIEW_SIZE'],
+                                                 app.config['PREVIEW_FORMAT'])
+        except ImportError as e:
+            log.warning("Previews need Pillow (and PyMuPDF for PDFs): %s", e)
+            return
+        except Exception as e:
+            # Corrupt or unsupported content: remember so nobody retries it
+            log.warning("Could not render preview for blob %s: %s", blob.id, e)
+            FileBlob.query.filter_by(id=blob.id, preview_type=None).update({'preview_type': 'none'})
+            db.session.commit()
+            return
+
+        location = backend.save(io.BytesIO(image), preview_key(blob.sha256, preview_type), preview_type)
+        recorded = FileBlob.query.filter_by(
+            id=blob.id, backend=blob.backend, storage_path=blob.storage_path, preview_type=None
+        ).update({'preview_path': location[1], 'preview_type': preview_type}, synchronize_session=False)
+        if recorded:
+            db.session.commit()
+            log.info("Rendered preview", extra={'blob_id': blob.id, 'bytes': len(image),
+                                                'ms': round((time.perf_counter() - start) * 1000, 1)})
+        else:
+            db.session.rollback()
+            delete_stored_file(*location)
+
+previews = PreviewGenerator(app.config['PREVIEW_WORKERS'])
 
 def split_lines(text):
     """Split text into lines with better handling"""
@@ -405,6 +2236,52 @@ def split_lines(text):
     # Clean and filter items
     return [item.strip() for item in items if item and item.strip() and len(item.strip()) > 0]
 
+def normalize_term(term):
+    """Case- and whitespace-insensitive key used to match allergy/condition terms"""
+    return ' '.join((term or '').lower().split())[:200]
+
+def parse_terms(text):
+    """Split a free-form list into unique (display, key) pairs, keeping input order"""
+    terms = []
+    seen = set()
+    for item in split_lines(text):
+        key = normalize_term(item)
+        if key and key not in seen:
+            seen.add(key)
+            terms.append((item[:200], key))
+    return terms
+
+def sync_member_terms(member):
+    """Rebuild the indexed allergy/underlying tokens after the text fields change"""
+    wanted = {}
+    for kind, source in (('allergy', member.drug_allergy), ('underlying', member.underlying)):
+        for display, key in parse_terms(source):
+            wanted[(kind, key)] = display
+
+    current = {(t.kind, t.term_key): t for t in member.terms}
+    for key, term in current.items():
+        if key not in wanted:
+            member.terms.remove(term)
+
+    for (kind, key), display in wanted.items():
+        if (kind, key) in current:
+            current[(kind, key)].term = display
+        else:
+            member.terms.append(MemberTerm(kind=kind, term=display, term_key=key))
+
+def stamp_schema_head():
+    """Record the newest migration as applied, for a schema just built by create_all.
+
+    Uses Alembic directly rather than flask_migrate.stamp, whose env.py would
+    reconfigure logging from alembic.ini.
+    """
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+    with db.engine.begin() as connection:
+        MigrationContext.configure(connection).stamp(script, 'head')
+
 def create_tables():
     """Enhanced table creation with better error handling"""
     try:
@@ -430,13 +2307,19 @@ def create_tables():
                 required_tables = {'member', 'doctor', 'medication', 'diagnosis', 'medical_file'}
                 missing_tables = required_tables - set(existing_tables)
                 
-                if missing_tables:
+                if missing_tables == required_tables:
+                    # Fresh database: create the current schema and mark it migrated.
+                    # Tables added later come only from migrations, so an existing
+                    # database is left for `flask db upgrade`.
                     app.logger.info(f"🏗️ Creating missing tables: {missing_tables}")
                     db.create_all()
+                    stamp_schema_head()
                     
                     # Verify creation
-                    new_tables = inspector.get_table_names()
+                    new_tables = inspect(db.engine).get_table_names()
                     app.logger.info(f"✅ Tables after creation: {new_tables}")
+                elif missing_tables:
+                    app.logger.error(f"❌ Missing tables {missing_tables}; run `flask db upgrade`")
                 else:
                     app.logger.info("✅ All required tables exist")
                     
@@ -489,48 +2372,6 @@ def database_health():
             "database_url": DATABASE_URL[:50] + "..." if DATABASE_URL else "Not set"
         }, 500
 
-def setup_database():
-    """Configure database with Railway-specific handling"""
-    DATABASE_URL = os.environ.get('DATABASE_URL')
-    
-    if not DATABASE_URL:
-        # Try Railway's PostgreSQL environment variables
-        PGHOST = os.environ.get('PGHOST')
-        PGPORT = os.environ.get('PGPORT', '5432')
-        PGUSER = os.environ.get('PGUSER')
-        PGPASSWORD = os.environ.get('PGPASSWORD')
-        PGDATABASE = os.environ.get('PGDATABASE')
-        
-        if all([PGHOST, PGUSER, PGPASSWORD, PGDATABASE]):
-            DATABASE_URL = f"postgresql://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{PGDATABASE}"
-            app.logger.info("✅ Constructed DATABASE_URL from Railway variables")
-        else:
-            # Fallback to SQLite for development
-            DATABASE_URL = 'sqlite:///medical.db'
-            app.logger.warning("⚠️ Using SQLite fallback - PostgreSQL not configured")
-    
-    # Fix postgres:// vs postgresql:// issue
-    if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-        app.logger.info("✅ Fixed postgres:// URL format")
-    
-    return DATABASE_URL
-
-# Replace your database configuration with:
-DATABASE_URL = setup_database()
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Add connection pooling for Railway
-if 'postgresql://' in DATABASE_URL:
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_size': 10,
-        'pool_recycle': 120,
-        'pool_pre_ping': True,
-        'max_overflow': 20,
-        'pool_timeout': 30
-    }
-
 # Add this debug route to test your database
 @app.route('/debug-db')
 def debug_database():
@@ -624,30 +2465,27 @@ def init_db():
 
 # Improved home route with database checks
 @app.route('/')
+@use_replica
 def home():
     try:
-        # Ensure database tables exist before any queries
-        with app.app_context():
+        stats = cache.get('home:stats')
+        if stats is None or stats.get('seq') != latest_change_seq():
+            # Ensure database tables exist before any queries
             from sqlalchemy import inspect
             inspector = inspect(db.engine)
             tables = inspector.get_table_names()
             
             # If no tables exist, create them
             if 'member' not in tables:
-                print("Member table not found. Creating tables...")
+                log.warning("Member table not found, creating tables")
                 db.create_all()
         
-        # Now safely query the database
-        total_members = Member.query.count()
-        recent_members = Member.query.order_by(Member.created_at.desc()).limit(6).all()
-        recent_additions = Member.query.filter(
-            Member.created_at >= datetime.now() - timedelta(days=30)
-        ).count()
-        
+            stats = load_home_stats()
+
         return render_template("index.html", 
-                             total_members=total_members,
-                             recent_members=recent_members,
-                             recent_additions=recent_additions)
+                             total_members=stats['total_members'],
+                             recent_members=stats['recent_members'],
+                             recent_additions=stats['recent_additions'])
     
     except Exception as e:
         # If templates are missing or other errors, show a simple page
@@ -668,6 +2506,210 @@ def home():
         </html>
         """
 
+def latest_change_seq():
+    """Newest member_change seq: a version for data any worker may have written"""
+    return db.session.query(db.func.max(MemberChange.seq)).scalar() or 0
+
+def load_home_stats():
+    """Compute dashboard counters and recent members and store them in the shared cache.
+
+    The stats carry the change-log seq they were computed at; home() only
+    reuses a cached copy while that is still the latest seq.
+    """
+    seq = latest_change_seq()
+    recent_members = Member.query.order_by(Member.created_at.desc()).limit(6).all()
+    stats = {
+        'total_members': Member.query.count(),
+        'recent_additions': Member.query.filter(
+            Member.created_at >= datetime.now() - timedelta(days=30)
+        ).count(),
+        'recent_members': [
+            {'member_id': m.member_id, 'name': m.name, 'age': m.age}
+            for m in recent_members
+        ],
+        'seq': seq
+    }
+    if reading_primary():
+        cache.set('home:stats', stats, ttl=60)
+    return stats
+
+class DashboardBroadcaster:
+    """Per-worker fan-out of dashboard deltas to Server-Sent Events subscribers.
+
+    One background thread per worker reads new member-level entries from
+    the member_change log (so writes from other workers are seen too),
+    recomputes the dashboard stats once and pushes the same event to every
+    subscriber queue. Local writes call notify() to skip the poll wait.
+    The thread only queries while someone is subscribed. Events carry the
+    seq of their last change, which the stream sends as the SSE id so a
+    reconnecting client can catch up with changes_since().
+    """
+
+    def __init__(self, poll_interval=2.0, max_subscribers=2):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_seq = None
+
+    def subscribe(self):
+        """New subscriber queue, or None when this worker already has max_subscribers"""
+        q = queue.Queue(maxsize=20)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if self._last_seq is None:
+                # Start from the current end of the log (called inside a request)
+                self._last_seq = latest_change_seq()
+            self._subscribers.add(q)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dashboard-broadcaster', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def notify(self):
+        self._wake.set()
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop its oldest event rather than block everyone
+                try:
+                    q.get_nowait()
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    continue
+            try:
+                with app.app_context():
+                    event = self._collect()
+                    db.session.remove()
+                if event:
+                    self.publish(event)
+            except Exception as e:
+                log.exception("Dashboard broadcaster error")
+
+    def _collect(self):
+        with self._lock:
+            last_seq = self._last_seq
+        if last_seq is None:
+            last_seq = latest_change_seq()
+            with self._lock:
+                if self._last_seq is None:
+                    self._last_seq = last_seq
+            return None
+
+        event = self.changes_since(last_seq)
+        if event:
+            with self._lock:
+                self._last_seq = event['seq']
+        return event
+
+    def changes_since(self, seq):
+        """Dashboard event for the member-level changes after seq, or None if there are none"""
+        changes = MemberChange.query.filter(
+            MemberChange.seq > seq,
+            MemberChange.entity == 'member'
+        ).order_by(MemberChange.seq).all()
+        if not changes:
+            return None
+
+        actions = {}
+        for change in changes:
+            actions.setdefault(change.action, []).append(change.member_id)
+        removed = set(actions.get('delete', []))
+        changed_ids = [mid for mid in actions.get('create', []) + actions.get('update', []) if mid not in removed]
+        rows = {
+            row.member_id: {'member_id': row.member_id, 'name': row.name, 'age': row.age}
+            for row in db.session.query(Member.member_id, Member.name, Member.age).filter(
+                Member.member_id.in_(changed_ids))
+        } if changed_ids else {}
+
+        stats = load_home_stats()
+        return {
+            'total_members': stats['total_members'],
+            'recent_additions': stats['recent_additions'],
+            'added': [rows[mid] for mid in actions.get('create', []) if mid in rows],
+            'updated': [rows[mid] for mid in actions.get('update', []) if mid in rows],
+            'removed': sorted(removed),
+            'seq': changes[-1].seq
+        }
+
+dashboard_broadcaster = DashboardBroadcaster(app.config['DASHBOARD_POLL_SECONDS'],
+                                             app.config['DASHBOARD_MAX_SUBSCRIBERS'])
+
+@app.route('/events/dashboard')
+def dashboard_events():
+    """Server-Sent Events stream of member-count and recent-member deltas for index.html.
+
+    Streams last DASHBOARD_STREAM_SECONDS; EventSource then reconnects with
+    Last-Event-ID and first gets whatever it missed. When the worker is at
+    DASHBOARD_MAX_SUBSCRIBERS the stream ends at once with a long retry.
+    """
+    subscriber = dashboard_broadcaster.subscribe()
+    if subscriber is None:
+        response = app.response_class('retry: 30000\n\n', mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def format_event(event):
+        return f"id: {event['seq']}\nevent: dashboard\ndata: {app.json.dumps(event)}\n\n"
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    try:
+        missed = dashboard_broadcaster.changes_since(last_event_id) if last_event_id is not None else None
+    except Exception:
+        dashboard_broadcaster.unsubscribe(subscriber)
+        raise
+    deadline = time.monotonic() + app.config['DASHBOARD_STREAM_SECONDS']
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            if missed:
+                yield format_event(missed)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Planned close: come back quickly
+                    yield 'retry: 1000\n\n'
+                    return
+                try:
+                    event = subscriber.get(timeout=min(15, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            dashboard_broadcaster.unsubscribe(subscriber)
+
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    # Also frees the slot if the client goes away before the generator starts
+    response.call_on_close(lambda: dashboard_broadcaster.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
 # Simple test route
 @app.route('/test')
 def test():
@@ -714,8 +2756,6 @@ def add_member():
             underlying = request.form.get('underlying', '').strip()
             drug_allergy = request.form.get('drug_allergy', '').strip()
 
-            print(f"Debug - Received form data: name='{name}', dob='{date_of_birth}', gender='{gender}'")
-
             # Validation
             if not name or not date_of_birth or not gender:
                 flash("Name, date of birth and gender are required!", "error")
@@ -724,9 +2764,8 @@ def add_member():
             # Validate date format
             try:
                 dob = datetime.strptime(date_of_birth, "%Y-%m-%d").date()
-                print(f"Debug - Parsed date: {dob}")
             except ValueError as e:
-                print(f"Debug - Date parsing error: {e}")
+                member_log.debug("Rejected date of birth %r: %s", date_of_birth, e)
                 flash("Invalid date format. Please use YYYY-MM-DD format.", "error")
                 return redirect(url_for('add_member'))
 
@@ -737,7 +2776,7 @@ def add_member():
             ).first()
             
             if existing_member:
-                print(f"Debug - Duplicate member found: {existing_member.name}")
+                member_log.debug("Duplicate member", extra={'member_id': existing_member.member_id})
                 flash("Member with the same name and date of birth already exists!", "error")
                 return redirect(url_for('add_member'))
 
@@ -751,13 +2790,11 @@ def add_member():
                 drug_allergy=drug_allergy,
                 underlying=underlying
             )
-            
-            print(f"Debug - Created new member object: {new_member.name}")
+            sync_member_terms(new_member)
             
             # Add to database
             db.session.add(new_member)
             db.session.flush()  # This gets the ID without committing
-            print(f"Debug - Member added to session, ID: {new_member.id}")
 
             # Add related information
             # Doctors
@@ -767,7 +2804,6 @@ def add_member():
                     if doctor_name.strip():
                         doctor = Doctor(name=doctor_name.strip(), member_id=new_member.id)
                         db.session.add(doctor)
-                        print(f"Debug - Added doctor: {doctor_name}")
 
             # Medications
             medication_text = request.form.get('medication', '').strip()
@@ -776,7 +2812,6 @@ def add_member():
                     if med_name.strip():
                         medication = Medication(name=med_name.strip(), member_id=new_member.id)
                         db.session.add(medication)
-                        print(f"Debug - Added medication: {med_name}")
 
             # Diagnoses
             diagnosis_text = request.form.get('diagnosis', '').strip()
@@ -785,11 +2820,12 @@ def add_member():
                     if diag_name.strip():
                         diagnosis = Diagnosis(name=diag_name.strip(), member_id=new_member.id)
                         db.session.add(diagnosis)
-                        print(f"Debug - Added diagnosis: {diag_name}")
 
             # Commit all changes
+            record_change(new_member.member_id, 'member', 'create', new_member.id)
             db.session.commit()
-            print(f"Debug - Successfully committed member: {new_member.member_id}")
+            invalidate_member(new_member.member_id)
+            member_log.info("Member created", extra={'member_id': new_member.member_id})
 
             flash("Member added successfully!", "success")
             return redirect(url_for('view_member', member_id=new_member.member_id))
@@ -797,10 +2833,7 @@ def add_member():
         except Exception as e:
             # Rollback any changes if error occurs
             db.session.rollback()
-            print(f"DEBUG ERROR in add_member: {str(e)}")
-            print(f"Error type: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()  # This prints the full error trace
+            member_log.exception("add_member failed")
             
             flash(f"An error occurred while adding member: {str(e)}", "error")
             return redirect(url_for('add_member'))
@@ -809,7 +2842,7 @@ def add_member():
     try:
         return render_template('add-member.html')
     except Exception as e:
-        print(f"DEBUG ERROR rendering template: {str(e)}")
+        log.exception("Could not render add-member.html, serving the backup form")
         # Return a simple HTML form if template fails
         return '''
         <html>
@@ -838,71 +2871,67 @@ def add_member():
         '''
 
 @app.route('/view-member/<member_id>')
+@use_replica
 def view_member(member_id):
     """Enhanced view member with comprehensive error handling"""
     try:
-        # Find the member
-        member = Member.query.filter_by(member_id=member_id).first()
+        version = get_member_version(member_id)
+        if not version:
+            flash('Member not found!', 'error')
+            return redirect(url_for('home'))
+
+        # Pending flash messages must still be rendered, so only answer 304 without them
+        etag, last_modified = version
+        if '_flashes' not in session and not_modified(etag, last_modified):
+            return with_validators(('', 304), etag, last_modified)
+
+        # Find the member, at the version the ETag describes
+        member = get_member(member_id, etag)
         if not member:
             flash('Member not found!', 'error')
             return redirect(url_for('home'))
-        
-        print(f"DEBUG: Found member: {member.name}")
-        
+
         # Handle diagnoses with multiple fallback strategies
         sorted_diagnoses = []
         try:
             # Strategy 1: Try to get diagnoses with sorting by created_at
-            diagnoses = member.diagnoses
-            print(f"DEBUG: Raw diagnoses count: {len(list(diagnoses))}")
-            
-            # Convert to list to avoid multiple queries
             diagnoses_list = list(member.diagnoses)
             
             if diagnoses_list:
-                print(f"DEBUG: First diagnosis: {diagnoses_list[0].name}")
-                
                 # Check if first diagnosis has created_at attribute
                 first_diag = diagnoses_list[0]
                 if hasattr(first_diag, 'created_at'):
-                    print(f"DEBUG: First diagnosis created_at: {first_diag.created_at}")
-                    
                     # Sort with None-safe logic
                     sorted_diagnoses = sorted(
                         diagnoses_list, 
                         key=lambda d: d.created_at or datetime.min, 
                         reverse=True
                     )
-                    print(f"DEBUG: Sorted {len(sorted_diagnoses)} diagnoses successfully")
                 else:
-                    print("DEBUG: Diagnosis missing created_at attribute - using unsorted list")
+                    member_log.warning("Diagnosis missing created_at attribute - using unsorted list")
                     sorted_diagnoses = diagnoses_list
-            else:
-                print("DEBUG: No diagnoses found")
-                sorted_diagnoses = []
                 
         except Exception as diag_error:
-            print(f"DEBUG ERROR loading diagnoses: {diag_error}")
-            print(f"DEBUG ERROR type: {type(diag_error).__name__}")
+            member_log.warning("Could not sort diagnoses: %s", diag_error, extra={'member_id': member_id})
             
             # Fallback: Try to get diagnoses without sorting
             try:
                 sorted_diagnoses = list(member.diagnoses)
-                print(f"DEBUG: Fallback successful - got {len(sorted_diagnoses)} diagnoses")
             except Exception as fallback_error:
-                print(f"DEBUG FALLBACK ERROR: {fallback_error}")
+                member_log.exception("Could not load diagnoses", extra={'member_id': member_id})
                 sorted_diagnoses = []
                 flash('Warning: Could not load diagnosis history', 'warning')
         
-        print(f"DEBUG: Final sorted_diagnoses count: {len(sorted_diagnoses)}")
+        if member_log.isEnabledFor(logging.DEBUG):
+            member_log.debug("Viewing member", extra={'member_id': member_id, 'diagnoses': len(sorted_diagnoses)})
         
         # Render template with error handling
         try:
-            return render_template('view-member.html', 
+            return with_validators(render_template('view-member.html', 
                                  member=member, 
-                                 sorted_diagnoses=sorted_diagnoses)
+                                 sorted_diagnoses=sorted_diagnoses), etag, last_modified)
         except Exception as template_error:
-            print(f"DEBUG TEMPLATE ERROR: {template_error}")
+            log.exception("Could not render view-member.html, serving the fallback page")
             
             # Return a simple fallback page if template fails
             return f'''
@@ -928,9 +2957,7 @@ def view_member(member_id):
             '''
             
     except Exception as e:
-        print(f"DEBUG CRITICAL ERROR in view_member: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        member_log.exception("view_member failed", extra={'member_id': member_id})
         
         # Return error page with debug info
         return f'''
@@ -952,7 +2979,7 @@ def view_member(member_id):
     
 @app.route('/update-member/<member_id>', methods=['GET','POST'])
 def update_member(member_id):
-    member=Member.query.filter_by(member_id=member_id).first()
+    member=get_member(member_id)
     if not member:
         flash("Member not found","error")
         return redirect(url_for('home'))
@@ -962,12 +2989,16 @@ def update_member(member_id):
         try:
             if action=='update_basic':
                 update_basic_info(member,request.form)
+                record_change(member.member_id,'member','update',member.id)
             elif action in ['add_doctor','edit_doctor','delete_doctor']:
                 handle_doctor_actions(member,request.form,action)
+                record_child_change(member,request.form,action)
             elif action in ['add_medication','edit_medication','delete_medication']:
                 handle_medication_actions(member,request.form,action)
+                record_child_change(member,request.form,action)
             elif action in ['add_diagnosis','edit_diagnosis','delete_diagnosis']:
                 handle_diagnosis_actions(member,request.form,action)
+                record_child_change(member,request.form,action)
             else:
                 flash("Invalid action","error")
 
@@ -978,6 +3009,8 @@ def update_member(member_id):
         except Exception as e:
             db.session.rollback()
             flash(F"Error:str{e}","error")
+
+        invalidate_member(member.member_id)
         
         return redirect(url_for('view_member',member_id=member.member_id))
     
@@ -985,6 +3018,27 @@ def update_member(member_id):
     return render_template('update-member.html',member=member)
 
 
+def record_child_change(member,form,action):
+    """Change-log entry for an add_/edit_/delete_<entity> action from update_member"""
+    verb,entity=action.split('_',1)
+    if verb=='add':
+        added=[obj for obj in db.session.new
+               if getattr(obj,'__tablename__',None)==entity and obj.member_id==member.id]
+        if not added:
+            return  # duplicate or empty name, nothing was written
+        db.session.flush()
+        entity_id=added[0].id
+    else:
+        entity_id=form.get(f'{entity}_id')
+        entity_id=int(entity_id) if entity_id and entity_id.isdigit() else None
+
+    record_change(
+        member.member_id,
+        entity,
+        {'add':'create','edit':'update','delete':'delete'}[verb],
+        entity_id
+    )
+
 def update_basic_info(member,form):
     member.name=form.get('name','').strip().lower()
     member.gender=form.get('gender',"")
@@ -1007,6 +3061,8 @@ def update_basic_info(member,form):
 
     if duplicate:
         raise ValueError("Another member with the same name and date_of_birth already exists! ")
+
+    sync_member_terms(member)
     
 def handle_doctor_actions(member,form,action):
     if action=='add_doctor':
@@ -1100,8 +3156,13 @@ def delete_member(member_id):
     member=Member.query.filter_by(member_id=member_id).first()
     if member:
         try:
+            for medical_file in list(member.medical_files):
+                delete_medical_file(medical_file)
+            db.session.expire(member, ['medical_files'])
+            record_change(member.member_id,'member','delete',member.id)
             db.session.delete(member)
             db.session.commit()
+            invalidate_member(member_id)
             flash('Member deleted successfully!','success')
         except Exception as e:
             db.session.rollback()
@@ -1112,6 +3173,7 @@ def delete_member(member_id):
     return redirect(url_for('home'))
 
 @app.route('/search')
+@use_replica
 def search_member():
     query = request.args.get('query', '').lower()
     if not query:
@@ -1127,14 +3189,277 @@ def search_member():
         return redirect(url_for('home'))
     
 @app.route('/api/member/<member_id>')
+@use_replica
 def api_get_member(member_id):
+    # The version is always read fresh: with a per-process cache another worker's
+    # write doesn't invalidate this copy, so a cached body is only served under
+    # the ETag it was built for
+    version=get_member_version(member_id)
+    if not version:
+        return {'error':'Member not found'},404
+    etag,last_modified=version
+
+    if not_modified(etag,last_modified):
+        return with_validators(('',304),etag,last_modified)
+
+    cache_key=f'member:{member_id}:json'
+    cached=cache.get(cache_key)
+    if cached is None or cached['etag']!=etag:
+        data=serialize_member(member_id)
+        if data is None:
+            return {'error':'Member not found'},404
+        cached={
+            'etag':etag,
+            'last_modified':last_modified.isoformat() if last_modified else None,
+            'data':data
+        }
+        if reading_primary():
+            cache.set(cache_key,cached)
+    return with_validators(cached['data'],etag,last_modified)
+
+MEMBER_API_FIELDS = ('id', 'member_id', 'name', 'date_of_birth', 'age', 'gender',
+                     'underlying', 'drug_allergy', 'created_at', 'updated_at')
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode()).decode())
+
+@app.route('/api/members')
+def api_list_members():
+    """Keyset-paginated member list.
+
+    ?fields=member_id,name,age picks columns (projected in SQL),
+    ?include=doctors,medications,diagnoses adds aggregated name lists,
+    ?limit= (max 200) and ?cursor= (next_cursor of the previous page) page through.
+    """
+    def csv_arg(name):
+        return [item.strip() for item in request.args.get(name, '').split(',') if item.strip()]
+
+    fields = csv_arg('fields') or list(MEMBER_API_FIELDS)
+    include = csv_arg('include')
+    unknown = [f for f in fields if f not in MEMBER_API_FIELDS] + [i for i in include if i not in MEMBER_RELATIONS]
+    if unknown:
+        return {'error': f"Unknown fields: {', '.join(unknown)}"}, 400
+
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        after_id = decode_cursor(request.args['cursor']) if request.args.get('cursor') else 0
+    except (ValueError, UnicodeDecodeError):
+        return {'error': 'Invalid limit or cursor'}, 400
+
+    # id is always selected for the cursor, even when not requested
+    columns = [Member.id] + [getattr(Member, f) for f in fields if f != 'id']
+    query = member_rows_query(*columns, include=include)
+    if query is None:
+        if include:
+            return {'error': 'include= is not supported on this database'}, 400
+        query = db.select(*columns)
+
+    rows = db.session.execute(
+        query.where(Member.id > after_id).order_by(Member.id).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    data = []
+    for row in rows:
+        item = {}
+        for f in fields:
+            value = getattr(row, f)
+            item[f] = value.isoformat() if isinstance(value, (date, datetime)) else value
+        for relation in include:
+            item[relation] = split_agg(getattr(row, relation))
+        data.append(item)
+
+    return {
+        'data': data,
+        'limit': limit,
+        'next_cursor': encode_cursor(rows[-1].id) if has_more else None
+    }
+
+@app.route('/api/changes')
+def api_changes():
+    """Change-log entries after ?since=<seq>, oldest first.
+
+    Returns one JSON batch of up to ?limit= (max 1000) entries with the
+    next_since to poll with, or with ?stream=1 streams every pending
+    entry as NDJSON, fetched in batches of ?limit=. seq is assigned in
+    commit order (see write_change_log), so next_since never passes an
+    entry that is still to commit.
+    """
+    try:
+        since=int(request.args.get('since',0))
+        limit=min(max(int(request.args.get('limit',500)),1),1000)
+    except ValueError:
+        return {'error':'since and limit must be integers'},400
+
+    def fetch(after):
+        return MemberChange.query.filter(
+            MemberChange.seq>after
+        ).order_by(MemberChange.seq).limit(limit).all()
+
+    if request.args.get('stream'):
+        def generate(after):
+            while True:
+                batch=fetch(after)
+                for change in batch:
+                    yield app.json.dumps(change.to_dict())+'\n'
+                if len(batch)<limit:
+                    break
+                after=batch[-1].seq
+        return app.response_class(stream_with_context(generate(since)),mimetype='application/x-ndjson')
+
+    changes=fetch(since)
+    return {
+        'changes':[change.to_dict() for change in changes],
+        'next_since':changes[-1].seq if changes else since,
+        'has_more':len(changes)==limit
+    }
+
+@app.route('/api/search-suggestions')
+def api_search_suggestions():
+    """Up to 8 members whose name or member ID contains the query"""
+    query=request.args.get('query','').strip().lower()
+    if len(query)<2:
+        return jsonify([])
+
+    # Keyed by the newest change seq, so any create, rename or delete starts a fresh key
+    cache_key=f'suggest:{latest_change_seq()}:{query}'
+    suggestions=cache.get(cache_key)
+    if suggestions is None:
+        rows=db.session.query(Member.member_id,Member.name).filter(
+            db.or_(Member.name.contains(query),Member.member_id.contains(query.upper()))
+        ).order_by(Member.name).limit(8).all()
+        suggestions=[{'member_id':row.member_id,'name':row.name} for row in rows]
+        cache.set(cache_key,suggestions,ttl=30)
+    return jsonify(suggestions)
+
+def pool_stats():
+    """Current pool occupancy plus cumulative checkout wait metrics"""
+    pool = db.engine.pool
+    stats = {
+        'pool': type(pool).__name__,
+        'checkouts': pool_metrics.checkouts,
+        'checkout_timeouts': pool_metrics.timeouts,
+        'checkout_wait_total_ms': round(pool_metrics.wait_total * 1000, 3),
+        'checkout_wait_max_ms': round(pool_metrics.wait_max * 1000, 3),
+        'checkout_wait_avg_ms': round(pool_metrics.wait_total / pool_metrics.checkouts * 1000, 3)
+                                if pool_metrics.checkouts else 0.0
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'in_use': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': pool.overflow()
+        })
+    return stats
+
+@app.route('/pool-stats')
+def pool_stats_view():
+    return pool_stats()
+
+@app.route('/cache-stats')
+def cache_stats():
+    return {'member_cache':member_cache.stats(),'cache':cache.stats()}
+
+class TotalsCollector:
+    """Member/file totals for /metrics, recounted at most once a minute via the shared cache"""
+
+    def describe(self):
+        # Keeps registration from running collect() (and its queries) at import time
+        return []
+
+    def collect(self):
+        totals = cache.get('metrics:totals')
+        if totals is None:
+            totals = {
+                'members': Member.query.count(),
+                'files': MedicalFile.query.count(),
+                'file_bytes': db.session.query(db.func.coalesce(db.func.sum(MedicalFile.file_size), 0)).scalar(),
+                'blob_bytes': db.session.query(db.func.coalesce(db.func.sum(FileBlob.size), 0)).scalar(),
+                'stored_bytes': db.session.query(
+                    db.func.coalesce(db.func.sum(db.func.coalesce(FileBlob.stored_size, FileBlob.size)), 0)).scalar()
+            }
+            cache.set('metrics:totals', totals, ttl=60)
+        yield GaugeMetricFamily('members', 'Members on record', value=totals['members'])
+        yield GaugeMetricFamily('medical_files', 'Medical files on record', value=totals['files'])
+        yield GaugeMetricFamily('medical_file_bytes', 'Total size of medical files', value=totals['file_bytes'])
+        yield GaugeMetricFamily('file_blob_bytes', 'Size of distinct stored content', value=totals.get('blob_bytes', 0))
+        yield GaugeMetricFamily('file_blob_stored_bytes', 'Size of distinct stored content at rest, after compression',
+                                value=totals.get('stored_bytes', 0))
+
+totals_collector = TotalsCollector()
+REGISTRY.register(totals_collector)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition, summed over all gunicorn workers in multiprocess mode"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(totals_collector)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+@app.route('/profile-stats')
+def profile_stats():
+    return {
+        'enabled':app.config['REQUEST_PROFILING'],
+        'window':route_timings.window,
+        'endpoints':route_timings.stats()
+    }
+
+@app.route('/api/member/<member_id>/allergy-check')
+def api_allergy_check(member_id):
+    """Check proposed medication(s) against a member's indexed drug allergies"""
+    medications = parse_terms(request.args.get('medication', ''))
+    if not medications:
+        return {'error':'medication is required'},400
+
     member=Member.query.filter_by(member_id=member_id).first()
-    if member:
-        return member.to_dict()
-    return {'error':'Member not found'},404
+    if not member:
+        return {'error':'Member not found'},404
+
+    matches=MemberTerm.query.filter(
+        MemberTerm.member_id==member.id,
+        MemberTerm.kind=='allergy',
+        MemberTerm.term_key.in_([key for _, key in medications])
+    ).all()
+
+    return {
+        'member_id':member.member_id,
+        'medications':[display for display, _ in medications],
+        'conflict':bool(matches),
+        'allergies':[term.term for term in matches]
+    }
+
+@app.route('/api/allergies/<drug>/members')
+def api_members_allergic_to(drug):
+    """List members with an indexed allergy to the given drug"""
+    key=normalize_term(drug)
+    if not key:
+        return {'error':'drug is required'},400
+
+    rows=db.session.query(Member.member_id, Member.name).join(
+        MemberTerm, MemberTerm.member_id==Member.id
+    ).filter(
+        MemberTerm.kind=='allergy',
+        MemberTerm.term_key==key
+    ).order_by(Member.name).all()
+
+    return {
+        'drug':drug,
+        'count':len(rows),
+        'members':[{'member_id':row.member_id,'name':row.name} for row in rows]
+    }
 @app.route('/upload-file/<member_id>', methods=['POST', 'GET'])
 def upload_file(member_id):
-    member = Member.query.filter_by(member_id=member_id).first()
+    member = get_member(member_id)
     if not member:
         flash("Member not found", "error")
         return redirect(url_for('home'))
@@ -1152,119 +3477,308 @@ def upload_file(member_id):
             return redirect(request.url) 
 
         if file and allowed_file(file.filename):
+            new_location = None
             try:
                 # Generate secure filename
                 original_filename = secure_filename(file.filename)
-                unique_filename = generate_unique_filename(original_filename)
-
-                # Get file size and store original content type
-                file.seek(0, 2)  # Seek to end
-                file_size = file.tell()  # Get position (file size)
-                file.seek(0)  # Reset to beginning
-                original_content_type = file.content_type
+                original_content_type = upload_content_type(file)
 
-                print(f"📁 Processing file: {original_filename}")
-                print(f"📏 File size: {file_size} bytes")
-                print(f"📄 Original content type: {original_content_type}")
+                upload_log.debug("Processing upload", extra={
+                    'member_id': member_id, 'filename': original_filename,
+                    'content_type': original_content_type})
 
-                # Try to upload to R2 first - pass the original file object
-                r2_path = upload_to_r2(file, unique_filename, member_id)
-
-                if r2_path:
-                    file_path = r2_path
-                    storage_type = 'r2'
-                    print(f"✅ File stored in R2: {r2_path}")
-                else:
-                    # Fallback to local storage
-                    print("🔄 Falling back to local storage...")
-                    file.seek(0)  # Reset file pointer for local save
-                    local_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                    file.save(local_path)  # Use Flask's save method
-                    file_path = local_path
-                    storage_type = 'local'
-                    print(f"⚠️ File stored locally: {file_path}")
+                # Store the content under its digest unless it is already on record
+                blob, stored = acquire_blob(file, original_filename, original_content_type)
+                if stored:
+                    new_location = (blob.backend, blob.storage_path)
+                file_path = blob.storage_path
+                file_size = blob.size
+                storage_type = blob.backend
 
                 # Create database record
                 medical_file = MedicalFile(
                     filename=original_filename,
                     file_path=file_path,
+                    backend=blob.backend,
                     file_size=file_size,
                     file_type=original_content_type,
                     description=description,
-                    member_id=member.id
+                    member_id=member.id,
+                    blob_id=blob.id
                 )
                 
                 db.session.add(medical_file)
+                db.session.flush()
+                record_change(member.member_id, 'file', 'create', medical_file.id)
+                member.updated_at = datetime.now()
                 db.session.commit()
+                invalidate_member(member_id)
+                if stored:
+                    UPLOAD_BYTES.labels(storage_type).inc(file_size)
+                if has_preview(medical_file) and not blob.preview_type:
+                    previews.submit(blob.id)
+                upload_log.info("File uploaded", extra={
+                    'member_id': member_id, 'file_id': medical_file.id,
+                    'storage': storage_type, 'size': file_size, 'deduplicated': not stored})
 
                 if storage_type == 'r2':
                     flash("File uploaded successfully to cloud storage!", 'success')
-                else:
+                elif storage.name == 'r2':
                     flash("File uploaded successfully (local backup)!", 'warning')
+                else:
+                    flash("File uploaded successfully!", 'success')
                     
                 return redirect(url_for('view_member', member_id=member_id))
 
             except Exception as e:
                 db.session.rollback()
+                # Content this upload wrote is orphaned unless a concurrent upload recorded it
+                if new_location and not FileBlob.query.filter_by(
+                        backend=new_location[0], storage_path=new_location[1]).first():
+                    delete_stored_file(*new_location)
                 flash(f"Error uploading file: {str(e)}", "error")
-                print(f"❌ Upload error: {e}")
-                import traceback
-                traceback.print_exc()
+                upload_log.exception("Upload failed", extra={'member_id': member_id})
         else:
             flash("Invalid file type. Allowed: PDF, Images, Word documents", "error")
 
     return render_template('upload-file.html', member=member)
 
+@app.route('/upload-files/<member_id>', methods=['POST'])
+def upload_files(member_id):
+    """Upload several files in one request and report a status for each.
+
+    Files come as repeated 'file' fields, with either one 'description' for
+    all of them or one per file in the same order. New content is stored
+    BULK_UPLOAD_WORKERS at a time and all the rows are committed together;
+    files that can't be accepted or stored are reported and skipped.
+    """
+    member = get_member(member_id)
+    if not member:
+        return {'error': 'Member not found'}, 404
+
+    files = [file for file in request.files.getlist('file') if file.filename]
+    if not files:
+        return {'error': 'No file selected'}, 400
+    if len(files) > app.config['BULK_UPLOAD_MAX_FILES']:
+        return {'error': f"At most {app.config['BULK_UPLOAD_MAX_FILES']} files per upload"}, 400
+    descriptions = [description.strip() for description in request.form.getlist('description')]
+    if len(descriptions) != len(files):
+        descriptions = [descriptions[0] if descriptions else ''] * len(files)
+
+    results = [{'filename': file.filename} for file in files]
+    accepted, uploads = [], []
+    for i, file in enumerate(files):
+        if not allowed_file(file.filename):
+            results[i].update(status='error', error='Invalid file type. Allowed: PDF, Images, Word documents')
+            continue
+        accepted.append(i)
+        uploads.append((file, secure_filename(file.filename), upload_content_type(file)))
+
+    created, uploaded = [], []
+    new_locations = []
+    try:
+        acquired = acquire_blobs(uploads, app.config['BULK_UPLOAD_WORKERS'], new_locations)
+        for i, (_, filename, content_type), outcome in zip(accepted, uploads, acquired):
+            if isinstance(outcome, Exception):
+                upload_log.error("Bulk upload could not store file: %s", outcome,
+                                 extra={'member_id': member_id, 'filename': filename})
+                results[i].update(status='error', error=f"Could not store file: {outcome}")
+                continue
+            blob, stored = outcome
+            medical_file = MedicalFile(
+                filename=filename,
+                file_path=blob.storage_path,
+                backend=blob.backend,
+                file_size=blob.size,
+                file_type=content_type,
+                description=descriptions[i],
+                member_id=member.id,
+                blob_id=blob.id
+            )
+            db.session.add(medical_file)
+            created.append((i, medical_file, blob, stored))
+
+        if created:
+            db.session.flush()
+            for i, medical_file, blob, stored in created:
+                record_change(member.member_id, 'file', 'create', medical_file.id)
+                # Read before the commit expires them
+                results[i].update(id=medical_file.id, size=blob.size, storage=blob.backend,
+                                  deduplicated=not stored)
+            member.updated_at = datetime.now()
+            uploaded = [(i, blob.id, blob.backend, blob.size, stored,
+                         has_preview(medical_file) and not blob.preview_type)
+                        for i, medical_file, blob, stored in created]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        upload_log.exception("Bulk upload failed", extra={'member_id': member_id})
+        # Content written for this batch is orphaned unless a concurrent upload recorded it
+        for location in new_locations:
+            if not FileBlob.query.filter_by(backend=location[0], storage_path=location[1]).first():
+                delete_stored_file(*location)
+        for i in accepted:
+            if results[i].get('status') != 'error':
+                results[i] = {'filename': results[i]['filename'], 'status': 'error',
+                              'error': f"Error uploading file: {str(e)}"}
+        return {'member_id': member_id, 'uploaded': 0, 'failed': len(files), 'files': results}, 500
+
+    if uploaded:
+        invalidate_member(member_id)
+    for i, blob_id, backend, size, stored, wants_preview in uploaded:
+        if stored:
+            UPLOAD_BYTES.labels(backend).inc(size)
+        if wants_preview:
+            previews.submit(blob_id)
+        results[i]['status'] = 'created'
+    upload_log.info("Files uploaded", extra={
+        'member_id': member_id, 'files': len(uploaded), 'failed': len(files) - len(uploaded),
+        'stored': sum(1 for *_, stored, _ in uploaded if stored)})
+
+    status = 200 if len(uploaded) == len(files) else 207 if uploaded else 400
+    return {'member_id': member_id, 'uploaded': len(uploaded), 'failed': len(files) - len(uploaded),
+            'files': results}, status
+
 @app.route('/download-file/<int:file_id>')
 def download_file(file_id):
-    from flask import send_file, redirect
-    
     medical_file = MedicalFile.query.get_or_404(file_id)
 
     try:
-        # Check if file is stored in R2 (path starts with 'members/')
-        if medical_file.file_path.startswith('members/'):
-            # File is in R2 - generate download URL
-            download_url = download_from_r2(medical_file.file_path)
-            if download_url:
-                return redirect(download_url)
-            else:
-                flash("Could not generate download link", "error")
-                return redirect(url_for('home'))
-        else:
-            # File is stored locally
-            if os.path.exists(medical_file.file_path):
-                return send_file(
-                    medical_file.file_path,
-                    as_attachment=True,
-                    download_name=medical_file.filename
-                )
-            else:
-                flash("File not found on server", "error")
-                return redirect(url_for('home'))
+        response = get_storage_backend(medical_file.backend).send(medical_file)
+        if response is None:
+            # The storage migrator may have just moved it
+            location = (medical_file.backend, medical_file.file_path)
+            db.session.refresh(medical_file)
+            if (medical_file.backend, medical_file.file_path) != location:
+                response = get_storage_backend(medical_file.backend).send(medical_file)
+        if response is None:
+            flash("File not found on server", "error")
+            return redirect(url_for('home'))
+        return response
         
     except Exception as e:
         flash(f"Error downloading file: {str(e)}", "error")
         return redirect(url_for('home'))
 
+@app.route('/file-preview/<int:file_id>')
+def file_preview(file_id):
+    """Thumbnail for the file list.
+
+    File ids can be reused once a file is deleted, so only a URL that names
+    the content (?v=<blob sha256>, as view-member.html links it) may be kept
+    for a year; anything else is revalidated against the ETag.
+    """
+    medical_file = MedicalFile.query.get_or_404(file_id)
+    blob = medical_file.blob
+    if not has_preview(medical_file) or blob.preview_type == 'none':
+        return {'error': 'No preview for this file'}, 404
+    if not blob.preview_path:
+        previews.submit(blob.id)
+        response = make_response({'error': 'Preview not ready'}, 404)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    response = make_response()
+    response.set_etag(f"{blob.sha256}-preview")
+    if request.if_none_match.contains(f"{blob.sha256}-preview"):
+        response.status_code = 304
+    else:
+        with closing(get_storage_backend(blob.backend).open(blob.preview_path)) as source:
+            response.set_data(source.read())
+        response.mimetype = blob.preview_type
+    if request.args.get('v') == blob.sha256:
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def send_local_file(medical_file, local_path, encoding=None):
+    """Serve a local upload with ETag/Last-Modified, Range and If-Range support.
+
+    Uploads are written once under a unique name, so the mtime/size ETag stays
+    valid for the file's lifetime and resumed downloads can use Range. With
+    SENDFILE_MODE set only headers are returned and the proxy sends the bytes
+    (and, for x-accel, answers conditional and range requests itself).
+    Content compressed at rest goes out as stored, labelled with encoding.
+    """
+    from flask import send_file
+
+    if app.config['SENDFILE_MODE'] == 'x-accel':
+        relative = os.path.relpath(local_path, os.path.abspath(app.config['UPLOAD_FOLDER']))
+        if not relative.startswith('..'):
+            response = make_response('')
+            response.headers['X-Accel-Redirect'] = (
+                app.config['X_ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + quote(relative.replace(os.sep, '/')))
+            response.headers['Content-Type'] = medical_file.file_type or 'application/octet-stream'
+            response.headers.set('Content-Disposition', 'attachment', filename=medical_file.filename)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+                response.headers['Vary'] = 'Accept-Encoding'
+            return response
+
+    # With X-Sendfile the proxy answers Range itself; only 304s are decided here
+    x_sendfile = app.config['USE_X_SENDFILE']
+    response = send_file(
+        local_path,
+        mimetype=medical_file.file_type or None,
+        as_attachment=True,
+        download_name=medical_file.filename,
+        conditional=not x_sendfile,
+        etag=True
+    )
+    if x_sendfile:
+        response.make_conditional(request.environ)
+    else:
+        response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def send_decoded_file(medical_file, raw, encoding, chunk_size=256 * 1024):
+    """Stream content compressed at rest to a client that doesn't accept its encoding.
+
+    raw is the stored (compressed) file object; it is decompressed chunk by
+    chunk as the response is sent, so memory stays flat. The ETag is the
+    content hash and Content-Length the original size; ranges aren't offered.
+    """
+    blob = medical_file.blob
+    if request.if_none_match.contains(blob.sha256):
+        raw.close()
+        response = make_response('', 304)
+    else:
+        reader = decoding_reader(raw, encoding)
+
+        def generate():
+            with closing(raw):
+                for chunk in iter(lambda: reader.read(chunk_size), b''):
+                    yield chunk
+
+        response = app.response_class(generate(), mimetype=medical_file.file_type or 'application/octet-stream',
+                                      direct_passthrough=True)
+        response.content_length = blob.size
+        response.headers.set('Content-Disposition', 'attachment', filename=medical_file.filename)
+        response.headers['Accept-Ranges'] = 'none'
+    response.set_etag(blob.sha256)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.route('/delete-file/<int:file_id>', methods=['POST'])
 def delete_file(file_id):
     medical_file = MedicalFile.query.get_or_404(file_id)
     member_id = medical_file.member.member_id
 
     try:
-        # Delete from storage
-        if medical_file.file_path.startswith('members/'):
-            # File is in R2
-            delete_from_r2(medical_file.file_path)
-        else:
-            # File is stored locally
-            if os.path.exists(medical_file.file_path):
-                os.remove(medical_file.file_path)
-
-        # Delete from database
-        db.session.delete(medical_file)
+        # Delete from database and storage; shared content goes only with its last reference
+        file_id = medical_file.id
+        delete_medical_file(medical_file)
+        medical_file.member.updated_at = datetime.now()
+        record_change(member_id, 'file', 'delete', file_id)
         db.session.commit()
+        invalidate_member(member_id)
         flash('File deleted successfully', "success")
 
     except Exception as e:
@@ -1274,31 +3788,25 @@ def delete_file(file_id):
     return redirect(url_for('view_member', member_id=member_id))
 
 @app.route('/backup-data')
+@use_replica
 def backup_data():
     try:
-        members = Member.query.all()
-        backup_data = []
-        
-        for member in members:
-            member_data = {
-                'name': member.name,
-                'member_id': member.member_id,
-                'date_of_birth': member.date_of_birth.strftime('%Y-%m-%d'),
-                'gender': member.gender,
-                'underlying': member.underlying,
-                'drug_allergy': member.drug_allergy,
-                'doctors': [d.name for d in member.doctors],
-                'medications': [m.name for m in member.medications],
-                'diagnoses': [d.name for d in member.diagnoses]
-            }
-            backup_data.append(member_data)
+        fields = ('name', 'member_id', 'date_of_birth', 'gender', 'underlying',
+                  'drug_allergy', 'doctors', 'medications', 'diagnoses')
+        query = member_rows_query()
+        if query is not None:
+            rows = db.session.execute(query.order_by(Member.id))
+            backup_data = [serialize_member_row(row) for row in rows]
+        else:
+            backup_data = [member.to_dict() for member in Member.query.all()]
         
-        return jsonify(backup_data)
+        return jsonify([{field: member[field] for field in fields} for member in backup_data])
     
     except Exception as e:
         return f"Backup failed: {str(e)}"
     
 @app.route('/export-members')
+@use_replica
 def export_members():
     try:
         members = Member.query.all()
@@ -2140,12 +4648,13 @@ def debug_datetime():
         return f"Debug failed: {str(e)}"
 
 if __name__ == '__main__':
-    print("Starting Medical App...")
+    log.info("Starting Medical App")
     create_tables()
+    storage_migrator.start()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
 else:
     # This runs when deployed (gunicorn)
-    print("App started by gunicorn...")
+    log.info("App started by gunicorn")
     with app.app_context():
         create_tables()
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""Benchmark compression at rest (STORAGE_COMPRESSION) per file type.
+
+For each sample file and codec (gzip, and zstd when the zstandard package
+is installed) reports the stored/original size ratio and the CPU time and
+throughput to compress (on upload) and decompress (on download by a client
+that doesn't accept the encoding), using the app's compression_writer and
+decoding_reader. "kept" says whether the upload path would store the
+compressed copy: the type is in COMPRESSIBLE_TYPES and it saves at least
+--min-saving.
+
+Samples are generated (text PDFs with and without deflated streams, a
+scanned PDF, a Word 97 style .doc, a .docx, JPEG and PNG) unless --files
+points at a directory of real documents, which are grouped by extension.
+
+Usage:
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --files ~/scans --levels 1,3,6 --repeat 5
+"""
+import argparse
+import io
+import mimetypes
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+WORDS = ('patient blood pressure systolic diastolic mmHg glucose fasting HbA1c creatinine eGFR potassium '
+         'sodium cholesterol LDL HDL triglycerides metformin amlodipine follow-up months referral '
+         'cardiology normal sinus rhythm impression recommendation history allergy penicillin').split()
+
+
+def paragraphs(rng, count):
+    return [' '.join(rng.choice(WORDS) for _ in range(rng.randint(12, 40))).capitalize() + '.'
+            for _ in range(count)]
+
+
+def sample_image(rng, size=(1240, 1754)):
+    """A page-like greyscale scan: light background, dark text-ish strokes and sensor noise"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    image = Image.new('L', size, 235)
+    draw = ImageDraw.Draw(image)
+    for y in range(120, size[1] - 120, 34):
+        x = 100
+        while x < size[0] - 150:
+            width = rng.randint(20, 90)
+            draw.rectangle([x, y, x + width, y + 14], fill=rng.randint(20, 70))
+            x += width + rng.randint(10, 25)
+    noise = Image.effect_noise(size, 12)
+    return Image.blend(image, noise, 0.15).filter(ImageFilter.SMOOTH)
+
+
+def make_pdf(rng, deflate, scanned=False):
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+    doc = pymupdf.open()
+    for _ in range(3 if scanned else 20):
+        page = doc.new_page()
+        if scanned:
+            out = io.BytesIO()
+            sample_image(rng).save(out, 'JPEG', quality=80)
+            page.insert_image(page.rect, stream=out.getvalue())
+        else:
+            # Text that doesn't fit the box is dropped, so keep it to roughly a page
+            page.insert_textbox(page.rect + (50, 50, -50, -50), '\n\n'.join(paragraphs(rng, 6)), fontsize=10)
+    # expand: write every stream uncompressed, as some scanners and converters do
+    return doc.tobytes(deflate=deflate, expand=0 if deflate else 255, garbage=1)
+
+
+def make_doc(rng):
+    """Word 97-2003 layout: OLE2 header, 512-byte sectors, UTF-16LE text stream, tables mostly zero"""
+    text = '\r'.join(paragraphs(rng, 150)).encode('utf-16-le')
+    header = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + bytes(16) + struct.pack('<HHHH', 0x3e, 3, 0xfffe, 9) + bytes(472)
+    fib = b'\xec\xa5' + bytes(1534) + bytes(rng.getrandbits(8) for _ in range(512))
+    body = header + fib + text
+    body += bytes(-len(body) % 512)
+    fat = b''.join(struct.pack('<I', i + 1) for i in range(len(body) // 512)) + b'\xff' * 2048
+    return body + fat + bytes(-len(fat) % 512) + bytes(8 * 512)
+
+
+def make_docx(rng):
+    xml = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+           '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+           + ''.join(f'<w:p><w:pPr><w:pStyle w:val="Normal"/></w:pPr><w:r><w:rPr><w:sz w:val="22"/></w:rPr>'
+                     f'<w:t xml:space="preserve">{p}</w:t></w:r></w:p>' for p in paragraphs(rng, 300))
+           + '</w:body></w:document>')
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', '<?xml version="1.0"?><Types/>')
+        docx.writestr('word/document.xml', xml)
+        logo = io.BytesIO()
+        sample_image(rng, (400, 200)).save(logo, 'PNG')
+        docx.writestr('word/media/image1.png', logo.getvalue(), compress_type=zipfile.ZIP_STORED)
+    return out.getvalue()
+
+
+def generated_samples(seed):
+    rng = random.Random(seed)
+    scan = io.BytesIO()
+    sample_image(rng).save(scan, 'JPEG', quality=85)
+    chart = io.BytesIO()
+    sample_image(rng, (800, 600)).save(chart, 'PNG')
+    return [
+        ('pdf (text, raw streams)', 'application/pdf', make_pdf(rng, deflate=False)),
+        ('pdf (text, deflated)', 'application/pdf', make_pdf(rng, deflate=True)),
+        ('pdf (scanned)', 'application/pdf', make_pdf(rng, deflate=True, scanned=True)),
+        ('doc', 'application/msword', make_doc(rng)),
+        ('docx', DOCX_TYPE, make_docx(rng)),
+        ('jpeg', 'image/jpeg', scan.getvalue()),
+        ('png', 'image/png', chart.getvalue()),
+    ]
+
+
+def file_samples(directory):
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            samples.append((name.rsplit('.', 1)[-1].lower() if '.' in name else name, content_type, data))
+    return samples
+
+
+def measure(medical, data, codec, level, repeat):
+    """(stored size, compress CPU s, decompress CPU s), CPU times the best of repeat runs"""
+    best_in = best_out = float('inf')
+    for _ in range(repeat):
+        out = io.BytesIO()
+        start = time.process_time()
+        with medical.compression_writer(out, codec, level, len(data)) as writer:
+            writer.write(data)
+        best_in = min(best_in, time.process_time() - start)
+        stored = out.getvalue()
+
+        start = time.process_time()
+        reader = medical.decoding_reader(io.BytesIO(stored), codec)
+        while reader.read(256 * 1024):
+            pass
+        best_out = min(best_out, time.process_time() - start)
+    return len(stored), best_in, best_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', help='directory of documents to measure instead of generated samples')
+    parser.add_argument('--codecs', default='gzip,zstd')
+    parser.add_argument('--levels', default='0', help='comma-separated levels; 0 is the codec default')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-saving', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('CACHE_URL', 'memory://')
+    # The app creates its upload folder in the working directory
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, ROOT)
+    import app as medical
+
+    codecs = args.codecs.split(',')
+    if 'zstd' in codecs:
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            print('zstandard not installed, skipping zstd')
+            codecs.remove('zstd')
+    samples = file_samples(args.files) if args.files else generated_samples(args.seed)
+
+    print(f"{'type':<24}{'codec':<8}{'size KB':>9}{'ratio':>8}{'comp ms':>9}{'MB/s':>8}"
+          f"{'decomp ms':>11}{'MB/s':>8}  kept")
+    for label, content_type, data in samples:
+        for codec in codecs:
+            for level in (int(level) for level in args.levels.split(',')):
+                stored, comp, decomp = measure(medical, data, codec, level, args.repeat)
+                ratio = stored / len(data)
+                kept = content_type in medical.COMPRESSIBLE_TYPES and ratio <= 1 - args.min_saving
+                mb = len(data) / (1024 * 1024)
+                name = codec + (f"-{level}" if level else '')
+                print(f"{label:<24}{name:<8}{len(data) / 1024:>9.0f}{ratio:>8.2f}{comp * 1000:>9.1f}"
+                      f"{mb / comp if comp else 0:>8.0f}{decomp * 1000:>11.1f}{mb / decomp if decomp else 0:>8.0f}"
+                      f"  {'yes' if kept else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark gunicorn startup time and per-worker memory with and without preload_app.
+
+For each GUNICORN_PRELOAD setting, starts gunicorn with gunicorn.conf.py,
+records the time until the first successful response and the CPU time
+spent by master + workers to boot, then warms every worker and reports
+RSS and PSS (proportional set size: shared copy-on-write pages are split
+between the processes sharing them, so it shows what preload saves).
+Linux only (/proc).
+
+Usage:
+    python benchmarks/bench_gunicorn_startup.py --workers 4
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def memory_kb(pid):
+    rss = pss = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Rss:'):
+                rss = int(line.split()[1])
+            elif line.startswith('Pss:'):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def run(preload, args, db_dir):
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port),
+               DATABASE_URL=f"sqlite:///{os.path.join(db_dir, f'preload{preload}.db')}",
+               WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_PRELOAD=str(preload),
+               R2_ACCOUNT_ID='bench')
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/cache-stats"
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                break
+            except Exception:
+                if time.perf_counter() - start > 60:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.05)
+        first_response = time.perf_counter() - start
+
+        # Let every worker finish booting, then touch each a few times
+        deadline = time.time() + 30
+        while len(children(proc.pid)) < args.workers and time.time() < deadline:
+            time.sleep(0.1)
+        time.sleep(2)
+        for _ in range(args.workers * 10):
+            urllib.request.urlopen(url, timeout=5).read()
+
+        workers = children(proc.pid)
+        boot_cpu = cpu_seconds(proc.pid) + sum(cpu_seconds(w) for w in workers)
+        mem = [memory_kb(w) for w in workers]
+        master_rss, master_pss = memory_kb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    return {
+        'first_response': first_response,
+        'boot_cpu': boot_cpu,
+        'worker_rss': sum(m[0] for m in mem) / len(mem) / 1024,
+        'worker_pss': sum(m[1] for m in mem) / len(mem) / 1024,
+        'total_pss': (sum(m[1] for m in mem) + master_pss) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp()
+    print(f"{args.workers} workers")
+    for preload in (0, 1):
+        r = run(preload, args, db_dir)
+        print(f"  preload={preload}  first response {r['first_response']:5.2f} s   boot CPU {r['boot_cpu']:5.2f} s   "
+              f"per-worker RSS {r['worker_rss']:6.1f} MB  PSS {r['worker_pss']:6.1f} MB   total PSS {r['total_pss']:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Benchmark the core routes through the Flask test client.
+
+Seeds --members synthetic members (see datagen.py) unless the database
+already holds enough, then drives home, search_member, view_member,
+add_member, update_member, backup_data and export_members and reports
+p50/p95/p99 latency and SQL queries per request. By default the worker
+and shared caches are cleared before every request so the numbers track
+route cost rather than cache hits; --warm keeps them.
+
+--json writes the results (with the commit and settings) to a file;
+--compare reads such a file from another commit, prints the change and
+exits non-zero if any p50 regressed by more than --threshold.
+
+Usage:
+    python benchmarks/bench_routes.py --members 2000 --json before.json
+    python benchmarks/bench_routes.py --members 2000 --compare before.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (scenario, iterations relative to --iterations); full-table routes get fewer
+SCENARIOS = [
+    ('home', 1.0),
+    ('search_member', 1.0),
+    ('view_member', 1.0),
+    ('add_member', 1.0),
+    ('update_member', 1.0),
+    ('backup_data', 0.1),
+    ('export_members', 0.1),
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    import datagen
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import app, db, Member, member_cache, cache
+
+    with app.app_context():
+        db.create_all()
+        existing = Member.query.count()
+    if existing < args.members:
+        datagen.generate(args.members - existing, seed=args.seed)
+
+    with app.app_context():
+        members = db.session.query(Member.member_id, Member.name, Member.date_of_birth, Member.gender).all()
+
+    queries = [0]
+
+    def count_query(*_):
+        queries[0] += 1
+
+    event.listen(Engine, 'before_cursor_execute', count_query)
+    rng = random.Random(args.seed)
+    client = app.test_client()
+
+    def request_for(scenario):
+        if scenario == 'home':
+            return client.get('/')
+        if scenario == 'search_member':
+            return client.get('/search', query_string={'query': rng.choice(members).name.split()[1]})
+        if scenario == 'view_member':
+            return client.get(f"/view-member/{rng.choice(members).member_id}")
+        if scenario == 'add_member':
+            return client.post('/add-member', data={
+                'name': f"bench {uuid.uuid4().hex[:10]}", 'date_of_birth': '1975-03-14', 'gender': 'Female',
+                'underlying': 'Hypertension, Diabetes', 'drug_allergy': 'Penicillin',
+                'doctor': 'Dr. Peter Hall', 'medication': 'Metformin 500mg\nAspirin 81mg',
+                'diagnosis': 'Hypertension, follow-up in 3 months'})
+        if scenario == 'update_member':
+            member = rng.choice(members)
+            return client.post(f"/update-member/{member.member_id}", data={
+                'action': 'update_basic', 'name': member.name, 'gender': member.gender,
+                'date_of_birth': member.date_of_birth.isoformat(),
+                'underlying': rng.choice(['Hypertension', 'Asthma, Gout', '']),
+                'drug_allergy': rng.choice(['Penicillin', 'Aspirin, Codeine', ''])})
+        if scenario == 'backup_data':
+            return client.get('/backup-data')
+        if scenario == 'export_members':
+            return client.get('/export-members')
+        raise ValueError(scenario)
+
+    results = {}
+    for scenario, weight in SCENARIOS:
+        if args.only and scenario not in args.only:
+            continue
+        iterations = max(3, int(args.iterations * weight))
+        timings, query_counts, errors = [], [], 0
+        for i in range(args.warmup + iterations):
+            if not args.warm:
+                member_cache.clear()
+                cache.clear()
+            queries[0] = 0
+            start = time.perf_counter()
+            response = request_for(scenario)
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                errors += 1
+            if i >= args.warmup:
+                timings.append(elapsed * 1000)
+                query_counts.append(queries[0])
+        results[scenario] = {
+            'requests': iterations,
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': round(sum(query_counts) / len(query_counts), 1),
+            'errors': errors,
+        }
+    event.remove(Engine, 'before_cursor_execute', count_query)
+    return results
+
+
+def print_results(results, baseline=None, threshold=0.2):
+    header = f"{'scenario':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'errors':>8}"
+    print(header + ('   p50 vs baseline' if baseline else ''))
+    regressions = []
+    for scenario, r in results.items():
+        line = (f"{scenario:<16}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                f"{r['queries']:>9.1f}{r['errors']:>8}")
+        before = (baseline or {}).get(scenario)
+        if before:
+            change = (r['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+            line += f"   {change:+7.1%}"
+            if r['queries'] != before['queries']:
+                line += f"  queries {before['queries']:g} -> {r['queries']:g}"
+            if change > threshold:
+                line += '  REGRESSION'
+                regressions.append(scenario)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--warm', action='store_true', help='keep caches between requests')
+    parser.add_argument('--only', nargs='*', help='run only these scenarios')
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file from another run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 slowdown counted as a regression')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('CACHE_URL', 'memory://')
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    results = run_benchmarks(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+                'members': args.members, 'iterations': args.iterations,
+                'seed': args.seed, 'warm': args.warm,
+                'results': results,
+            }, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Microbenchmark: per-member serialization cost.
+
+Compares Member.to_dict (ORM objects + three lazy relationship loads)
+against serialize_member_row (one aggregated query, plain tuples), and
+the stdlib json provider against the orjson one.
+
+Usage:
+    python benchmarks/bench_serialization.py --members 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    import app as medical_app
+    from app import app, db, Member, Doctor, Medication, Diagnosis
+
+    random.seed(1)
+    with app.app_context():
+        for i in range(args.members):
+            member = Member(member_id=f'B{i:05d}', name=f'member {i}', date_of_birth=date(1950 + i % 60, 1 + i % 12, 1 + i % 28),
+                            age=30, gender=random.choice(['Male', 'Female']), underlying='HT, DM', drug_allergy='Penicillin')
+            db.session.add(member)
+            db.session.flush()
+            for j in range(3):
+                db.session.add(Doctor(name=f'Dr {i}-{j}', member_id=member.id))
+                db.session.add(Medication(name=f'Med {i}-{j}', member_id=member.id))
+                db.session.add(Diagnosis(name=f'Diagnosis {i}-{j}', member_id=member.id))
+        db.session.commit()
+
+        def orm_path():
+            db.session.expunge_all()
+            return [m.to_dict() for m in Member.query.all()]
+
+        def row_path():
+            rows = db.session.execute(medical_app.member_rows_query())
+            return [medical_app.serialize_member_row(row) for row in rows]
+
+        assert sorted(orm_path(), key=lambda m: m['id']) == sorted(row_path(), key=lambda m: m['id'])
+
+        results = {
+            'Member.to_dict (ORM)': timed(orm_path, args.repeat),
+            'serialize_member_row (aggregated)': timed(row_path, args.repeat),
+        }
+
+        payload = row_path()
+        results['json.dumps (stdlib)'] = timed(lambda: json.dumps(payload, sort_keys=True), args.repeat)
+        if medical_app.orjson is not None:
+            results['app.json.dumps (orjson)'] = timed(lambda: app.json.dumps(payload), args.repeat)
+
+    print(f"{args.members} members, best of {args.repeat}")
+    for name, seconds in results.items():
+        print(f"  {name:<36} {seconds * 1000:9.2f} ms total  {seconds / args.members * 1e6:8.1f} us/member")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark mixed view_member reads and add_member writes against SQLite.
+
+Runs gunicorn (gthread, several worker processes sharing one SQLite
+file) with SQLITE_TUNING=0 (default rollback journal) and SQLITE_TUNING=1
+(WAL, synchronous=NORMAL, mmap, cache_size, busy_timeout), seeds
+--members members, then drives --clients concurrent clients for
+--duration seconds with --write-ratio of requests being add_member.
+The worker member cache is disabled so every read hits the database.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py --duration 10 --clients 16
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def add_member(session, base):
+    response = session.post(base + '/add-member', allow_redirects=False, data={
+        'name': f'bench {uuid.uuid4().hex[:12]}',
+        'date_of_birth': f'19{random.randint(30, 99)}-0{random.randint(1, 9)}-1{random.randint(0, 9)}',
+        'gender': random.choice(['Male', 'Female']),
+        'doctor': 'Dr Bench', 'medication': 'Aspirin\nMetformin', 'diagnosis': 'Hypertension',
+    })
+    location = response.headers.get('Location', '')
+    ok = response.status_code == 302 and '/view-member/' in location
+    return ok, location.rsplit('/', 1)[-1] if ok else None
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run(tuning, args, db_dir):
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port),
+               DATABASE_URL=f"sqlite:///{os.path.join(db_dir, f'tuning{tuning}.db')}",
+               SQLITE_TUNING=str(tuning),
+               SECRET_KEY='bench',
+               MEMBER_CACHE_SIZE='0',
+               WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS='4',
+               R2_ACCOUNT_ID='bench')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                requests.get(base + '/cache-stats', timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.1)
+
+        seed = requests.Session()
+        member_ids = [mid for ok, mid in (add_member(seed, base) for _ in range(args.members)) if ok]
+        if not member_ids:
+            raise RuntimeError("seeding failed: add_member returned no members")
+
+        reads, writes, errors = [], [], [0]
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + args.duration
+
+        def client():
+            session = requests.Session()
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    if random.random() < args.write_ratio:
+                        ok, mid = add_member(session, base)
+                        bucket = writes
+                        if ok:
+                            member_ids.append(mid)
+                    else:
+                        response = session.get(f"{base}/view-member/{random.choice(member_ids)}", allow_redirects=False)
+                        ok = response.status_code == 200
+                        bucket = reads
+                except requests.RequestException:
+                    ok, bucket = False, reads
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        bucket.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    return {
+        'reads': len(reads) / args.duration, 'writes': len(writes) / args.duration,
+        'read_p95': percentile(reads, 0.95), 'write_p95': percentile(writes, 0.95),
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--members', type=int, default=100)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp()
+    print(f"{args.clients} clients, {args.workers} workers, {args.duration:.0f}s, {args.write_ratio:.0%} writes")
+    for tuning in (0, 1):
+        r = run(tuning, args, db_dir)
+        print(f"  SQLITE_TUNING={tuning}  reads {r['reads']:7.1f}/s (p95 {r['read_p95'] * 1000:6.0f} ms)   "
+              f"writes {r['writes']:6.1f}/s (p95 {r['write_p95'] * 1000:6.0f} ms)   errors {r['errors']}")
+
+
+if __name__ == '__main__':
+    main()
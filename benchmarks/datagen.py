@@ -0,0 +1,128 @@
+"""Synthetic data generator for benchmarks.
+
+Builds members with doctors, medications, diagnoses (spread over time),
+drug allergies / underlying conditions and medical file records into
+whatever DATABASE_URL points at (SQLite or PostgreSQL). The same --seed
+always produces the same data, so runs on different commits compare
+like with like. File rows only reference paths; no file content is
+written.
+
+Usage:
+    python benchmarks/datagen.py --members 5000 --database-url sqlite:////tmp/bench.db
+    python benchmarks/datagen.py --members 5000 --database-url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_NAMES = ['somchai', 'malee', 'anan', 'kanya', 'prasert', 'siriporn', 'wichai', 'nok', 'john', 'mary',
+               'david', 'sarah', 'michael', 'emma', 'james', 'olivia', 'daniel', 'sophia', 'arthit', 'ploy']
+LAST_NAMES = ['srisuk', 'wongsawat', 'chaiyaporn', 'boonmee', 'rattanakul', 'smith', 'johnson', 'brown',
+              'williams', 'jones', 'garcia', 'miller', 'davis', 'thongchai', 'saelim', 'kaewmanee']
+DOCTORS = ['Dr. Somsak Phan', 'Dr. Anong Lert', 'Dr. Peter Hall', 'Dr. Linda Cruz', 'Dr. Chai Wattana',
+           'Dr. Emily Stone', 'Dr. Kittisak Dee', 'Dr. Rachel Moore', 'Dr. Narong Sook', 'Dr. Paul Young']
+MEDICATIONS = ['Metformin 500mg', 'Amlodipine 5mg', 'Atorvastatin 20mg', 'Losartan 50mg', 'Aspirin 81mg',
+               'Omeprazole 20mg', 'Levothyroxine 50mcg', 'Simvastatin 40mg', 'Salbutamol inhaler',
+               'Paracetamol 500mg', 'Insulin glargine', 'Furosemide 40mg', 'Warfarin 3mg', 'Gabapentin 300mg']
+DIAGNOSES = [
+    'Hypertension, BP 150/95, advised low-salt diet and follow-up in 3 months',
+    'Type 2 diabetes mellitus, HbA1c 7.8%, continue metformin',
+    'Dyslipidemia, LDL 165 mg/dL, started statin therapy',
+    'Acute upper respiratory infection, symptomatic treatment',
+    'Gastroesophageal reflux disease, PPI for 8 weeks',
+    'Osteoarthritis of the right knee, physiotherapy referral',
+    'Chronic kidney disease stage 3a, eGFR 52, monitor potassium',
+    'Asthma, mild persistent, inhaler technique reviewed',
+    'Hypothyroidism, TSH 6.2, dose adjusted',
+    'Atrial fibrillation, rate controlled, anticoagulation reviewed',
+]
+ALLERGIES = ['Penicillin', 'Sulfonamides', 'Aspirin', 'Ibuprofen', 'Codeine', 'Amoxicillin', 'Latex',
+             'Iodine contrast', 'Cephalosporins']
+UNDERLYING = ['Hypertension', 'Diabetes', 'Dyslipidemia', 'Asthma', 'CKD', 'Gout', 'COPD', 'Heart failure']
+FILE_TYPES = [('lab_results.pdf', 'application/pdf'), ('xray_chest.jpg', 'image/jpeg'),
+              ('referral_letter.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+              ('ecg.png', 'image/png')]
+
+
+def pick(rng, items, low, high):
+    return rng.sample(items, rng.randint(low, high))
+
+
+def generate(count, seed=42, batch_size=500):
+    """Insert count members into the app's database; returns the number inserted"""
+    from app import (app, db, Member, Doctor, Medication, Diagnosis, MedicalFile,
+                     calculate_age_from_date, sync_member_terms)
+
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+
+    with app.app_context():
+        db.create_all()
+        taken = {member_id for (member_id,) in db.session.query(Member.member_id)}
+        inserted = 0
+        while inserted < count:
+            for _ in range(min(batch_size, count - inserted)):
+                member_id = ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(6))
+                while member_id in taken:
+                    member_id = ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(6))
+                taken.add(member_id)
+
+                dob = date(1930, 1, 1) + timedelta(days=rng.randint(0, 90 * 365))
+                created = now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86400))
+                member = Member(
+                    member_id=member_id,
+                    name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {member_id.lower()}",
+                    date_of_birth=dob,
+                    age=calculate_age_from_date(dob),
+                    gender=rng.choice(['Male', 'Female']),
+                    underlying=', '.join(pick(rng, UNDERLYING, 0, 3)),
+                    drug_allergy=', '.join(pick(rng, ALLERGIES, 0, 2)),
+                    created_at=created,
+                    updated_at=created
+                )
+                sync_member_terms(member)
+                member.doctors = [Doctor(name=name) for name in pick(rng, DOCTORS, 1, 3)]
+                member.medications = [Medication(name=name) for name in pick(rng, MEDICATIONS, 0, 5)]
+                member.diagnoses = [
+                    Diagnosis(name=text, created_at=created + timedelta(days=rng.randint(0, 365)))
+                    for text in pick(rng, DIAGNOSES, 1, 6)
+                ]
+                member.medical_files = [
+                    MedicalFile(filename=filename, file_path=f"uploads/bench/{member_id}_{filename}",
+                                file_size=rng.randint(20_000, 4_000_000), file_type=file_type,
+                                description='Synthetic benchmark file', uploaded_at=created)
+                    for filename, file_type in pick(rng, FILE_TYPES, 0, 3)
+                ]
+                db.session.add(member)
+                inserted += 1
+            db.session.commit()
+        return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='defaults to $DATABASE_URL')
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    if not os.getenv('DATABASE_URL'):
+        parser.error('--database-url or DATABASE_URL is required')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, ROOT)
+
+    start = time.perf_counter()
+    inserted = generate(args.members, seed=args.seed)
+    print(f"inserted {inserted} members in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Load test the file routes against a local R2 stand-in.
+
+Starts the in-memory S3 stub (s3_stub.py, optional --s3-delay per call)
+and gunicorn with R2_ENDPOINT_URL pointing at it, creates a member, then
+for each --sizes entry runs three phases from --concurrency clients:
+
+  upload    POST /upload-file/<member>   (--files uploads)
+  download  GET /download-file/<id>, following the presigned redirect
+  delete    POST /delete-file/<id>       (every uploaded file)
+
+and reports requests/s, MB/s, p95 latency, error rate and worker
+saturation (http_requests_in_progress from /metrics over the
+workers x threads the server has, sampled while the phase runs).
+Every upload has distinct content unless --same-content is given, in
+which case all but the first are deduplicated and skip the R2 PUT.
+
+Usage:
+    python benchmarks/load_test_files.py --sizes 64KB,1MB,8MB --files 60 --concurrency 16
+"""
+import argparse
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from s3_stub import start_s3_stub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKET = 'loadtest'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_size(text):
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*(KB|MB|B)?', text.strip(), re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"bad size: {text}")
+    unit = (match.group(2) or 'B').upper()
+    return int(float(match.group(1)) * {'B': 1, 'KB': 1024, 'MB': 1024 * 1024}[unit])
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+
+class SaturationSampler(threading.Thread):
+    """Polls /metrics for requests in progress while a phase runs"""
+
+    def __init__(self, base, capacity, interval=0.2):
+        super().__init__(daemon=True)
+        self.base, self.capacity, self.interval = base, capacity, interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            try:
+                text = requests.get(self.base + '/metrics', timeout=2).text
+            except requests.RequestException:
+                continue
+            match = re.search(r'^http_requests_in_progress (\S+)$', text, re.MULTILINE)
+            if match:
+                # The scrape itself occupies one thread
+                self.samples.append(max(0.0, float(match.group(1)) - 1) / self.capacity)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return (sum(self.samples) / len(self.samples) if self.samples else 0.0,
+                max(self.samples, default=0.0))
+
+
+def run_phase(name, base, capacity, jobs, concurrency):
+    """Run callables returning (ok, bytes) concurrently; returns the phase summary"""
+    sampler = SaturationSampler(base, capacity)
+    sampler.start()
+
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            ok, size = job()
+        except requests.RequestException:
+            ok, size = False, 0
+        return ok, size, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, jobs))
+    elapsed = time.perf_counter() - start
+    sat_avg, sat_max = sampler.stop()
+
+    ok = [r for r in results if r[0]]
+    return {
+        'phase': name, 'requests': len(results),
+        'rps': len(results) / elapsed,
+        'mbps': sum(r[1] for r in ok) / elapsed / (1024 * 1024),
+        'p95_ms': percentile([r[2] for r in results], 0.95) * 1000,
+        'error_rate': 1 - len(ok) / len(results) if results else 0.0,
+        'sat_avg': sat_avg, 'sat_max': sat_max,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='64KB,1MB,8MB', help='comma-separated file sizes (B, KB, MB)')
+    parser.add_argument('--files', type=int, default=40, help='uploads (and downloads) per size')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--s3-delay', type=float, default=0.02, help='seconds added to every R2 call')
+    parser.add_argument('--same-content', action='store_true', help='upload identical bytes every time')
+    args = parser.parse_args()
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+
+    stub = start_s3_stub(args.s3_delay)
+    work_dir = tempfile.mkdtemp()
+    db_path = os.path.join(work_dir, 'loadtest.db')
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port), DATABASE_URL=f"sqlite:///{db_path}", SECRET_KEY='loadtest',
+               LOG_LEVEL='WARNING', WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads),
+               GUNICORN_WORKER_CLASS=args.worker_class,
+               R2_ACCOUNT_ID='loadtest', R2_ACCESS_KEY_ID='loadtest', R2_SECRET_ACCESS_KEY='loadtest',
+               R2_BUCKET_NAME=BUCKET, R2_ENDPOINT_URL=stub.url)
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    # Run from a scratch directory so any local-storage fallback lands there, not in the repo
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+                             '--pythonpath', ROOT],
+                            cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    capacity = args.workers * (args.threads if args.worker_class == 'gthread' else 1)
+    try:
+        for _ in range(300):
+            try:
+                requests.get(base + '/metrics', timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.1)
+
+        response = requests.post(base + '/add-member', allow_redirects=False, data={
+            'name': 'load test', 'date_of_birth': '1970-01-01', 'gender': 'Female'})
+        member_id = response.headers['Location'].rsplit('/', 1)[-1]
+
+        print(f"{args.workers} {args.worker_class} workers x {args.threads} threads, "
+              f"{args.concurrency} clients, R2 stub delay {args.s3_delay * 1000:.0f} ms")
+        print(f"{'size':>8} {'phase':<9}{'req/s':>8}{'MB/s':>9}{'p95 ms':>9}{'errors':>8}{'sat avg':>9}{'sat max':>9}")
+        for size in sizes:
+            payload = os.urandom(size)
+
+            def upload(i=0):
+                # Content-addressed storage would dedupe identical uploads; vary the tail
+                body = payload if args.same_content else payload[:-8] + i.to_bytes(8, 'big')
+                r = requests.post(f"{base}/upload-file/{member_id}", allow_redirects=False,
+                                  files={'file': (f"scan_{i}.pdf", body, 'application/pdf')},
+                                  data={'description': 'load test'})
+                return r.status_code == 302 and '/view-member/' in r.headers.get('Location', ''), size
+
+            phases = [run_phase('upload', base, capacity,
+                                [lambda i=i: upload(i) for i in range(args.files)], args.concurrency)]
+
+            with sqlite3.connect(db_path) as conn:
+                rows = conn.execute("SELECT id, backend FROM medical_file").fetchall()
+            file_ids = [file_id for file_id, backend in rows if backend == 'r2']
+            if len(file_ids) < len(rows):
+                print(f"  warning: {len(rows) - len(file_ids)} uploads fell back to local storage")
+
+            def download(file_id):
+                r = requests.get(f"{base}/download-file/{file_id}")
+                return r.status_code == 200 and len(r.content) == size, len(r.content)
+
+            def delete(file_id):
+                r = requests.post(f"{base}/delete-file/{file_id}", allow_redirects=False)
+                return r.status_code == 302, 0
+
+            phases.append(run_phase('download', base, capacity,
+                                    [lambda f=random.choice(file_ids): download(f) for _ in range(args.files)],
+                                    args.concurrency))
+            phases.append(run_phase('delete', base, capacity,
+                                    [lambda f=f: delete(f) for f in [file_id for file_id, _ in rows]],
+                                    args.concurrency))
+
+            label = f"{size / 1024:.0f}KB" if size < 1024 * 1024 else f"{size / 1024 / 1024:g}MB"
+            for p in phases:
+                print(f"{label:>8} {p['phase']:<9}{p['rps']:>8.1f}{p['mbps']:>9.1f}{p['p95_ms']:>9.0f}"
+                      f"{p['error_rate']:>8.1%}{p['sat_avg']:>9.0%}{p['sat_max']:>9.0%}")
+        print(f"objects left in the R2 stub: {len(stub.objects)}")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+if __name__ == '__main__':
+    main()
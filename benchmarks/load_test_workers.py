@@ -0,0 +1,129 @@
+"""Load test: concurrent R2-bound requests under sync vs threaded gunicorn workers.
+
+Starts a local S3 stand-in that answers every request after --delay
+seconds (simulating R2 round-trip latency), then for each worker class
+starts gunicorn with gunicorn.conf.py and fires --requests requests at
+/test-r2 (one head_bucket call each) from --concurrency client threads.
+
+Usage:
+    python benchmarks/load_test_workers.py --requests 80 --concurrency 16
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_slow_s3(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            time.sleep(delay)
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        do_HEAD = do_GET = do_PUT = do_DELETE = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def run(worker_class, args, s3_url, db_dir):
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port),
+               DATABASE_URL=f"sqlite:///{os.path.join(db_dir, worker_class + '.db')}",
+               GUNICORN_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads),
+               R2_ACCOUNT_ID='loadtest', R2_ACCESS_KEY_ID='loadtest',
+               R2_SECRET_ACCESS_KEY='loadtest', R2_BUCKET_NAME='loadtest',
+               R2_ENDPOINT_URL=s3_url)
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base + '/cache-stats')
+
+        def one(_):
+            start = time.perf_counter()
+            with urllib.request.urlopen(base + '/test-r2', timeout=120) as response:
+                body = response.read()
+            return time.perf_counter() - start, b'R2 Test Successful' in body
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    latencies = sorted(r[0] for r in results)
+    return {
+        'rps': len(results) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'ok': sum(1 for r in results if r[1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=80)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--delay', type=float, default=0.2, help='simulated R2 latency in seconds')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--worker-class', action='append', dest='worker_classes',
+                        help='repeatable; default: sync and gthread')
+    args = parser.parse_args()
+
+    s3 = start_slow_s3(args.delay)
+    s3_url = f"http://127.0.0.1:{s3.server_address[1]}"
+    db_dir = tempfile.mkdtemp()
+
+    print(f"{args.requests} requests to /test-r2, {args.concurrency} concurrent, "
+          f"{args.workers} workers, R2 latency {args.delay * 1000:.0f} ms")
+    for worker_class in args.worker_classes or ['sync', 'gthread']:
+        r = run(worker_class, args, s3_url, db_dir)
+        print(f"  {worker_class:<8} {r['rps']:7.1f} req/s   p50 {r['p50'] * 1000:7.0f} ms   "
+              f"p95 {r['p95'] * 1000:7.0f} ms   ok {r['ok']}/{args.requests}")
+    s3.shutdown()
+
+
+if __name__ == '__main__':
+    main()
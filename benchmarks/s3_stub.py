@@ -0,0 +1,157 @@
+"""In-memory S3-compatible server standing in for Cloudflare R2 in load tests.
+
+Implements just what the app's boto3 calls need, path-style:
+head_bucket, put_object / upload_fileobj (including multipart and
+aws-chunked bodies), get_object (also via presigned URLs; signatures
+are not checked), head_object and delete_object. --delay adds a fixed
+per-request latency to mimic the round trip to R2.
+
+Usage:
+    python benchmarks/s3_stub.py --port 9000 --delay 0.02
+"""
+import argparse
+import hashlib
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class S3Stub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0):
+        super().__init__(address, S3StubHandler)
+        self.delay = delay
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class S3StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _target(self):
+        parts = urlsplit(self.path)
+        bucket, _, key = parts.path.lstrip('/').partition('/')
+        return bucket, key, parse_qs(parts.query, keep_blank_values=True)
+
+    def _body(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if 'x-amz-decoded-content-length' not in self.headers:
+            return raw
+        # aws-chunked: "<hex size>[;chunk-signature=...]\r\n<data>\r\n" ... "0\r\n<trailers>\r\n\r\n"
+        data, pos = bytearray(), 0
+        while True:
+            line_end = raw.index(b'\r\n', pos)
+            size = int(raw[pos:line_end].split(b';')[0], 16)
+            if size == 0:
+                return bytes(data)
+            data += raw[line_end + 2:line_end + 2 + size]
+            pos = line_end + 2 + size + 2
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+    def do_HEAD(self):
+        self._delay()
+        bucket, key, _ = self._target()
+        if not key:
+            return self._reply(200)
+        obj = self.server.objects.get((bucket, key))
+        if obj is None:
+            return self._reply(404)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(obj['data'])))
+        self.send_header('Content-Type', obj['content_type'])
+        self.send_header('ETag', obj['etag'])
+        self.end_headers()
+
+    def do_GET(self):
+        self._delay()
+        bucket, key, _ = self._target()
+        obj = self.server.objects.get((bucket, key))
+        if obj is None:
+            return self._reply(404, b'<Error><Code>NoSuchKey</Code></Error>', {'Content-Type': 'application/xml'})
+        self._reply(200, obj['data'], {'Content-Type': obj['content_type'], 'ETag': obj['etag']})
+
+    def do_PUT(self):
+        self._delay()
+        bucket, key, query = self._target()
+        data = self._body()
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self.server.lock:
+            if 'uploadId' in query:
+                upload = self.server.uploads[query['uploadId'][0]]
+                upload['parts'][int(query['partNumber'][0])] = data
+            else:
+                self.server.objects[(bucket, key)] = {
+                    'data': data, 'etag': etag,
+                    'content_type': self.headers.get('Content-Type', 'application/octet-stream')}
+        self._reply(200, headers={'ETag': etag})
+
+    def do_POST(self):
+        self._delay()
+        bucket, key, query = self._target()
+        self._body()
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            with self.server.lock:
+                self.server.uploads[upload_id] = {
+                    'parts': {}, 'content_type': self.headers.get('Content-Type', 'application/octet-stream')}
+            body = (f'<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                    f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>')
+            return self._reply(200, body.encode(), {'Content-Type': 'application/xml'})
+
+        with self.server.lock:
+            upload = self.server.uploads.pop(query['uploadId'][0])
+            data = b''.join(upload['parts'][n] for n in sorted(upload['parts']))
+            etag = f'"{hashlib.md5(data).hexdigest()}-{len(upload["parts"])}"'
+            self.server.objects[(bucket, key)] = {'data': data, 'etag': etag, 'content_type': upload['content_type']}
+        body = (f'<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                f'<ETag>{etag}</ETag></CompleteMultipartUploadResult>')
+        self._reply(200, body.encode(), {'Content-Type': 'application/xml'})
+
+    def do_DELETE(self):
+        self._delay()
+        bucket, key, query = self._target()
+        with self.server.lock:
+            if 'uploadId' in query:
+                self.server.uploads.pop(query['uploadId'][0], None)
+            else:
+                self.server.objects.pop((bucket, key), None)
+        self._reply(204)
+
+
+def start_s3_stub(delay=0.0, port=0):
+    server = S3Stub(('127.0.0.1', port), delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+    stub = S3Stub(('127.0.0.1', args.port), args.delay)
+    print(f"S3 stub listening on {stub.url}")
+    stub.serve_forever()
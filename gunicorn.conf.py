@@ -0,0 +1,118 @@
+"""Gunicorn settings for the medical app.
+
+The R2 helpers (upload_to_r2, download_from_r2, test_r2_connection) spend
+most of their time waiting on the network, so the default sync worker
+(one request per process) leaves the app idle while a single upload
+blocks. Workers here are threaded by default.
+
+The app is preloaded in the master so boto3, SQLAlchemy, the models and
+setup_r2_config() are imported/run once and shared copy-on-write with
+the workers; post_fork then drops the master's pooled DB connections so
+no socket is shared across processes.
+
+    GUNICORN_WORKER_CLASS  gthread (default), gevent or sync
+    WEB_CONCURRENCY        worker processes (default: derived from CPU count)
+    GUNICORN_MAX_WORKERS   cap for the derived worker count (default 8)
+    GUNICORN_THREADS       threads per gthread worker (default: 2 x CPUs, 4..16)
+    GUNICORN_CONNECTIONS   max greenlets per gevent worker (default 100)
+    GUNICORN_TIMEOUT       worker timeout in seconds (default 60)
+    GUNICORN_PRELOAD       preload the app in the master (default 1, 0 with gevent)
+    GUNICORN_MAX_REQUESTS  recycle a worker after this many requests (default 1000, 0 = never)
+    PROMETHEUS_MULTIPROC_DIR  existing dir where workers write /metrics samples (default: a
+                              fresh temp dir; emptied of *.db files when the master starts)
+
+gevent needs `pip install gevent` (and `psycogreen` when using PostgreSQL).
+Keep SQLALCHEMY pool_size + max_overflow >= threads per worker.
+"""
+import os
+import sys
+import tempfile
+
+
+def cpu_count():
+    # Respect container CPU affinity where available
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cpus = cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if os.environ.get('WEB_CONCURRENCY'):
+    workers = int(os.environ['WEB_CONCURRENCY'])
+else:
+    # sync workers only overlap I/O across processes; threaded ones need fewer
+    derived = 2 * cpus + 1 if worker_class == 'sync' else cpus + 1
+    workers = max(2, min(derived, int(os.environ.get('GUNICORN_MAX_WORKERS', '8'))))
+
+# gunicorn silently turns sync into gthread when threads > 1
+if worker_class == 'gthread':
+    threads = int(os.environ.get('GUNICORN_THREADS') or max(4, min(2 * cpus, 16)))
+else:
+    threads = 1
+worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', '100'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+# SSE (/events/dashboard) keeps connections open; keep-alive lets browsers reuse them
+keepalive = 5
+
+# gevent must monkey-patch before the app imports ssl/socket users, so no preload there
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0' if worker_class == 'gevent' else '1') == '1'
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+
+accesslog = '-'
+
+# /metrics aggregates every worker's samples from files in this directory. It has
+# to be set before the app imports prometheus_client (on reload it already is).
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='medical-metrics-')
+
+
+def on_starting(server):
+    # Once per master, not per reload: samples left by a previous run would be summed in
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.db'):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def post_fork(server, worker):
+    medical = sys.modules.get('app')
+    if medical is not None:
+        # Preloaded: the engines' pools were created in the master (create_tables),
+        # the replica binds' too
+        with medical.app.app_context():
+            for engine in medical.db.engines.values():
+                engine.dispose(close=False)
+        # ...and the log listener thread only exists in the master
+        medical.configure_logging()
+
+    if worker_class == 'gevent':
+        # psycopg2 blocks the whole hub unless its wait callback is made gevent-aware
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen not installed - PostgreSQL calls will block gevent workers")
+
+
+def post_worker_init(worker):
+    # Runs after the app is loaded in the worker, preloaded or not; the
+    # migrator's file lock keeps it to one worker per host
+    medical = sys.modules.get('app')
+    if medical is not None:
+        medical.storage_migrator.start()
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (e.g. pool connections in use)
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
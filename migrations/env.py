@@ -97,6 +97,13 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # The app turns foreign_keys on for SQLite connections; batch
+            # migrations recreate parent tables, which that would block.
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            # End the autobegun transaction so Alembic opens (and commits) its own
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,30 @@
+"""Index member_id on child tables
+
+Revision ID: 04a54d0e6ee9
+Revises: 844f8772f2b4
+Create Date: 2026-10-19 11:40:07.281944
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04a54d0e6ee9'
+down_revision = '844f8772f2b4'
+branch_labels = None
+depends_on = None
+
+TABLES = ['doctor', 'medication', 'diagnosis', 'medical_file']
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f(f'ix_{table}_member_id'), ['member_id'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_member_id'))
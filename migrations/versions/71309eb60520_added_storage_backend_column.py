@@ -0,0 +1,33 @@
+"""Added storage backend column to medical_file and file_blob
+
+Revision ID: 71309eb60520
+Revises: 762f1b41e6f3
+Create Date: 2026-10-19 16:40:18.127904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '71309eb60520'
+down_revision = '762f1b41e6f3'
+branch_labels = None
+depends_on = None
+
+# (table, path column) - backend was implied by the R2 key prefixes until now
+TABLES = [('medical_file', 'file_path'), ('file_blob', 'storage_path')]
+
+
+def upgrade():
+    for table, path_column in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('backend', sa.String(length=10), server_default='local', nullable=False))
+        op.execute(f"UPDATE {table} SET backend = 'r2' "
+                   f"WHERE {path_column} LIKE 'members/%' OR {path_column} LIKE 'blobs/%'")
+
+
+def downgrade():
+    for table, _ in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('backend')
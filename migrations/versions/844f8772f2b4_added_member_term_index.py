@@ -0,0 +1,73 @@
+"""Added member_term index for drug allergies and underlying conditions
+
+Revision ID: 844f8772f2b4
+Revises: 899c182fb28c
+Create Date: 2026-10-19 09:12:41.530217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '844f8772f2b4'
+down_revision = '899c182fb28c'
+branch_labels = None
+depends_on = None
+
+
+def split_terms(text):
+    # Same separators as split_lines() in app.py
+    items = [text or '']
+    for sep in ['\n', ',', ';', '|']:
+        items = [part for item in items for part in item.split(sep)]
+
+    terms = []
+    seen = set()
+    for item in items:
+        item = item.strip()
+        key = ' '.join(item.lower().split())[:200]
+        if key and key not in seen:
+            seen.add(key)
+            terms.append((item[:200], key))
+    return terms
+
+
+def upgrade():
+    op.create_table('member_term',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('term', sa.String(length=200), nullable=False),
+        sa.Column('term_key', sa.String(length=200), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('member_term', schema=None) as batch_op:
+        batch_op.create_index('ix_member_term_kind_key', ['kind', 'term_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_member_term_member_id'), ['member_id'], unique=False)
+
+    # Backfill tokens for existing members
+    connection = op.get_bind()
+    member_term = sa.table('member_term',
+        sa.column('kind', sa.String),
+        sa.column('term', sa.String),
+        sa.column('term_key', sa.String),
+        sa.column('member_id', sa.Integer)
+    )
+    rows = []
+    for member_id, drug_allergy, underlying in connection.execute(
+            sa.text('SELECT id, drug_allergy, underlying FROM member')):
+        for kind, source in (('allergy', drug_allergy), ('underlying', underlying)):
+            for term, key in split_terms(source):
+                rows.append({'kind': kind, 'term': term, 'term_key': key, 'member_id': member_id})
+    if rows:
+        op.bulk_insert(member_term, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('member_term', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_member_term_member_id'))
+        batch_op.drop_index('ix_member_term_kind_key')
+
+    op.drop_table('member_term')
@@ -9,6 +9,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeFileUpload();
     initializeSearchEnhancements();
     initializeTooltips();
+    initializeDashboardStream();
     
     // Auto-dismiss alerts after 5 seconds
     setTimeout(function() {
@@ -369,11 +370,110 @@ function debounce(func, wait) {
 }
 
 /**
- * Perform search (placeholder for future implementation)
+ * Perform search - fill the search box's datalist with cached suggestions
  */
 function performSearch(query) {
-    // This can be enhanced to show live search results
-    console.log('Searching for:', query);
+    const searchInput = document.querySelector('form[action*="search"] input[name="query"]');
+    if (!searchInput) return;
+
+    let datalist = document.getElementById('search-suggestions');
+    if (!datalist) {
+        datalist = document.createElement('datalist');
+        datalist.id = 'search-suggestions';
+        searchInput.parentNode.appendChild(datalist);
+        searchInput.setAttribute('list', datalist.id);
+    }
+
+    fetch('/api/search-suggestions?query=' + encodeURIComponent(query))
+        .then(response => response.ok ? response.json() : [])
+        .then(suggestions => {
+            datalist.innerHTML = '';
+            suggestions.forEach(function(member) {
+                const option = document.createElement('option');
+                option.value = member.member_id;
+                option.label = member.name;
+                datalist.appendChild(option);
+            });
+        })
+        .catch(error => console.log('Search suggestions failed:', error));
+}
+
+/**
+ * Live dashboard updates over Server-Sent Events (home page only)
+ */
+function initializeDashboardStream() {
+    const totalEl = document.getElementById('stat-total-members');
+    if (!totalEl || !window.EventSource) return;
+
+    const source = new EventSource(totalEl.dataset.streamUrl);
+    source.addEventListener('dashboard', function(e) {
+        const update = JSON.parse(e.data);
+        totalEl.textContent = update.total_members;
+        const recentEl = document.getElementById('stat-recent-additions');
+        if (recentEl) recentEl.textContent = update.recent_additions;
+
+        const list = document.getElementById('recent-members');
+        if (!list) {
+            // No recent-members section rendered yet - let the page build it
+            if (update.added.length) window.location.reload();
+            return;
+        }
+
+        update.removed.forEach(function(memberId) {
+            const card = list.querySelector('[data-member-id="' + memberId + '"]');
+            if (card) card.remove();
+        });
+        update.updated.forEach(function(member) {
+            const card = list.querySelector('[data-member-id="' + member.member_id + '"]');
+            if (card) card.replaceWith(buildRecentMemberCard(member));
+        });
+        update.added.forEach(function(member) {
+            // A catch-up after reconnecting can repeat a member already shown
+            const existing = list.querySelector('[data-member-id="' + member.member_id + '"]');
+            if (existing) existing.remove();
+            list.prepend(buildRecentMemberCard(member));
+        });
+        while (list.children.length > 6) {
+            list.lastElementChild.remove();
+        }
+    });
+}
+
+/**
+ * Recent member card matching the markup in index.html
+ */
+function buildRecentMemberCard(member) {
+    const col = document.createElement('div');
+    col.className = 'col-md-6 col-lg-4';
+    col.dataset.memberId = member.member_id;
+
+    const card = document.createElement('div');
+    card.className = 'card member-card';
+    const body = document.createElement('div');
+    body.className = 'card-body';
+
+    const title = document.createElement('h6');
+    title.className = 'card-title text-capitalize';
+    title.innerHTML = '<i class="bi bi-person me-2"></i>';
+    title.appendChild(document.createTextNode(member.name));
+
+    const text = document.createElement('p');
+    text.className = 'card-text';
+    text.innerHTML = '<small class="text-muted"><i class="bi bi-credit-card me-1"></i>ID: </small><br>' +
+                     '<small class="text-muted"><i class="bi bi-calendar me-1"></i>Age: </small>';
+    const small = text.querySelectorAll('small');
+    small[0].appendChild(document.createTextNode(member.member_id));
+    small[1].appendChild(document.createTextNode(member.age + ' years'));
+
+    const link = document.createElement('a');
+    link.className = 'btn btn-outline-primary btn-sm';
+    link.href = '/view-member/' + encodeURIComponent(member.member_id);
+    link.innerHTML = '<i class="bi bi-eye me-1"></i>View Details';
+
+    body.append(title, text, link);
+    card.appendChild(body);
+    col.appendChild(card);
+    return col;
 }
 
 /**
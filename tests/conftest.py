@@ -0,0 +1,46 @@
+"""The app configures itself from the environment when imported, so set that up first"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix='medical-tests-')
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    SECRET_KEY='test',
+    LOG_LEVEL='WARNING',
+    CACHE_URL='memory://',
+    STORAGE_BACKEND='local',
+    STORAGE_MIGRATE_INTERVAL='0',
+    PREVIEWS_ENABLED='0',
+)
+# UPLOAD_FOLDER is relative to the working directory
+os.chdir(WORKDIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as medical  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with medical.app.app_context():
+        medical.db.drop_all()
+        medical.db.create_all()
+    shutil.rmtree(os.path.join(medical.app.config['UPLOAD_FOLDER'], 'blobs'), ignore_errors=True)
+    medical.cache.clear()
+    medical.member_cache.clear()
+    return medical.app.test_client()
+
+
+@pytest.fixture
+def member_id(client):
+    response = client.post('/add-member', data={'name': 'Ann Lee', 'date_of_birth': '1970-01-01', 'gender': 'Female'})
+    return response.headers['Location'].rsplit('/', 1)[-1]
+
+
+def stored_blobs():
+    """Paths of content under the upload folder's blobs/ tree"""
+    root = os.path.join(medical.app.config['UPLOAD_FOLDER'], 'blobs')
+    return sorted(os.path.join(path, name) for path, _, names in os.walk(root) for name in names)
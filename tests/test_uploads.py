@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+from conftest import medical, stored_blobs
+
+
+def blob_rows():
+    with medical.app.app_context():
+        return [(blob.sha256, blob.refcount) for blob in medical.FileBlob.query.all()]
+
+
+def fail_record_change(*args, **kwargs):
+    raise RuntimeError('boom')
+
+
+def test_upload_rolls_back_blob_when_it_fails_after_record_blob(client, member_id, monkeypatch):
+    monkeypatch.setattr(medical, 'record_change', fail_record_change)
+    response = client.post(f'/upload-file/{member_id}', data={
+        'file': (io.BytesIO(b'%PDF-1.4 lab results'), 'lab.pdf', 'application/pdf')})
+
+    assert response.status_code == 200
+    assert blob_rows() == []
+    assert stored_blobs() == []
+
+
+def test_failed_upload_releases_reference_to_existing_blob(client, member_id, monkeypatch):
+    data = b'%PDF-1.4 shared'
+    client.post(f'/upload-file/{member_id}', data={'file': (io.BytesIO(data), 'a.pdf', 'application/pdf')})
+    assert [refcount for _, refcount in blob_rows()] == [1]
+
+    monkeypatch.setattr(medical, 'record_change', fail_record_change)
+    client.post(f'/upload-file/{member_id}', data={'file': (io.BytesIO(data), 'b.pdf', 'application/pdf')})
+
+    assert [refcount for _, refcount in blob_rows()] == [1]
+    assert len(stored_blobs()) == 1
+
+
+def test_bulk_upload_failing_partway_leaves_no_blobs(client, member_id, monkeypatch):
+    record_blob = medical.record_blob
+    calls = []
+
+    def fail_second(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 2:
+            raise RuntimeError('boom')
+        return record_blob(*args, **kwargs)
+
+    monkeypatch.setattr(medical, 'record_blob', fail_second)
+    response = client.post(f'/upload-files/{member_id}', data={'file': [
+        (io.BytesIO(f'%PDF-1.4 report {n}'.encode()), f'report{n}.pdf', 'application/pdf') for n in range(3)]})
+
+    assert response.status_code == 500
+    assert response.json['uploaded'] == 0
+    assert len(calls) == 2
+    assert blob_rows() == []
+    assert stored_blobs() == []
+    with medical.app.app_context():
+        assert medical.MedicalFile.query.count() == 0